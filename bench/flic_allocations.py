@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+'''
+Measures the memory FlicClient allocates while decoding and dispatching a
+canned stream of flicd events, using tracemalloc: what each event
+allocates and frees again while it's dispatched (decoded fields, event
+objects, ...), and what stays allocated when callbacks keep the button
+addresses around (as e.g. `main.getFlicButtonName` lookups would).
+
+Compare against an older fliclib with:
+    git show <revision>:fliclib.py > /tmp/fliclib_before.py
+    bench/flic_allocations.py --baseline /tmp/fliclib_before.py
+'''
+
+import argparse
+import tracemalloc
+
+from flicd import (
+    BUTTON_ADDRESS,
+    FakeFlicd,
+    getCannedPacketStream,
+    loadFliclib
+)
+
+
+def benchmarkAllocations(fliclib, count):
+    '''
+    Returns: tuple Bytes allocated at the peak of dispatching an event, and
+        bytes still allocated after it, per event
+    '''
+
+    flicd = FakeFlicd(fliclib)
+    client = fliclib.FlicClient('127.0.0.1', flicd.port)
+    # allocated up front, so that the list growing doesn't get counted
+    keptAddresses = [None] * count
+    positions = iter(range(count * 2))
+
+    def keepAddress(bdAddr):
+        keptAddresses[next(positions) % count] = bdAddr
+
+    scanner = fliclib.ButtonScanner()
+    scanner.on_advertisement_packet = \
+        lambda scanner, bdAddr, *args: keepAddress(bdAddr)
+    client.add_scanner(scanner)
+
+    channel = fliclib.ButtonConnectionChannel(BUTTON_ADDRESS)
+    channel.on_button_up_or_down = \
+        lambda channel, *args: keepAddress(channel.bd_addr)
+    client.add_connection_channel(channel)
+
+    packets = [
+        bytearray(i[2:]) for i in getCannedPacketStream(
+            fliclib,
+            scanner._scan_id,
+            channel._conn_id,
+            count
+        )
+    ]
+
+    # warm up caches, so that only the steady state gets measured
+    for packet in packets[:100]:
+        client._dispatch_event(packet)
+
+    transient = 0
+    tracemalloc.start()
+
+    for packet in packets:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        client._dispatch_event(packet)
+        transient += tracemalloc.get_traced_memory()[1] - before
+
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    client.close()
+    flicd.close()
+
+    return transient / count, retained / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split(
+        '\n\n')[0])
+    parser.add_argument('--baseline', help='fliclib.py to compare against')
+    parser.add_argument('--events', type=int, default=50000)
+    args = parser.parse_args()
+
+    fliclibs = [('current', loadFliclib())]
+
+    if args.baseline:
+        fliclibs.insert(0, ('baseline', loadFliclib(args.baseline)))
+
+    for label, fliclib in fliclibs:
+        print('{:<9} per event: peak {:>7.1f} B   retained {:>7.1f} B'.format(
+            label,
+            *benchmarkAllocations(fliclib, args.events)
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+'''
+Measures how many flicd events per second FlicClient decodes and dispatches,
+both straight through `_dispatch_event` and over a socket from a stand-in
+flicd, on a canned stream of scanner advertisements and button events.
+
+Compare against an older fliclib with:
+    git show <revision>:fliclib.py > /tmp/fliclib_before.py
+    bench/flic_dispatch.py --baseline /tmp/fliclib_before.py
+'''
+
+import argparse
+import threading
+import time
+
+from flicd import (
+    BUTTON_ADDRESS,
+    FakeFlicd,
+    getCannedPacketStream,
+    loadFliclib
+)
+
+
+def setUpClient(fliclib, flicd, eventCounts):
+    client = fliclib.FlicClient('127.0.0.1', flicd.port)
+
+    def count(name):
+        def onEvent(*args):
+            eventCounts[name] = eventCounts.get(name, 0) + 1
+
+        return onEvent
+
+    scanner = fliclib.ButtonScanner()
+    scanner.on_advertisement_packet = count('advertisement')
+    client.add_scanner(scanner)
+
+    channel = fliclib.ButtonConnectionChannel(BUTTON_ADDRESS)
+    channel.on_button_up_or_down = count('upOrDown')
+    channel.on_button_click_or_hold = count('clickOrHold')
+    channel.on_button_single_or_double_click = count('singleOrDoubleClick')
+    channel.on_button_single_or_double_click_or_hold = \
+        count('singleOrDoubleClickOrHold')
+    client.add_connection_channel(channel)
+
+    return client, scanner._scan_id, channel._conn_id
+
+
+def benchmarkDispatch(fliclib, count, rounds):
+    '''
+    Returns: float Events per second through `_dispatch_event` alone
+    '''
+
+    flicd = FakeFlicd(fliclib)
+    eventCounts = {}
+    client, scanId, connId = setUpClient(fliclib, flicd, eventCounts)
+    # strip the length prefixes - `_dispatch_event` gets the bare packets
+    packets = [
+        bytearray(i[2:])
+        for i in getCannedPacketStream(fliclib, scanId, connId, count)
+    ]
+    best = None
+
+    for _ in range(rounds):
+        startTime = time.perf_counter()
+
+        for packet in packets:
+            client._dispatch_event(packet)
+
+        duration = time.perf_counter() - startTime
+        best = duration if best is None else min(best, duration)
+
+    client.close()
+    flicd.close()
+
+    assert sum(eventCounts.values()) == count * rounds, eventCounts
+
+    return count / best
+
+
+def benchmarkSocket(fliclib, count, rounds):
+    '''
+    Returns: float Events per second received, decoded and dispatched by
+        `handle_events`
+    '''
+
+    best = None
+
+    for _ in range(rounds):
+        flicd = FakeFlicd(fliclib)
+        eventCounts = {}
+        client, scanId, connId = setUpClient(fliclib, flicd, eventCounts)
+        stream = b''.join(
+            getCannedPacketStream(fliclib, scanId, connId, count))
+
+        eventThread = threading.Thread(target=client.handle_events)
+        eventThread.start()
+
+        startTime = time.perf_counter()
+
+        flicd.send(stream)
+        flicd.close()
+        eventThread.join()
+
+        duration = time.perf_counter() - startTime
+        best = duration if best is None else min(best, duration)
+
+        assert sum(eventCounts.values()) == count, eventCounts
+
+    return count / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split(
+        '\n\n')[0])
+    parser.add_argument('--baseline', help='fliclib.py to compare against')
+    parser.add_argument('--events', type=int, default=100000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    fliclibs = [('current', loadFliclib())]
+
+    if args.baseline:
+        fliclibs.insert(0, ('baseline', loadFliclib(args.baseline)))
+
+    for label, fliclib in fliclibs:
+        print('{:<9} dispatch only: {:>9,.0f} events/s   over socket: '
+              '{:>9,.0f} events/s'.format(
+                  label,
+                  benchmarkDispatch(fliclib, args.events, args.rounds),
+                  benchmarkSocket(fliclib, args.events, args.rounds)
+              ))
+
+
+if __name__ == '__main__':
+    main()
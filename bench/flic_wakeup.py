@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+'''
+Measures how long it takes until a callback handed to
+`FlicClient.run_on_handle_events_thread` from another thread runs on the
+thread handling the events, with a stand-in flicd answering pings.
+
+Compare against an older fliclib with:
+    git show <revision>:fliclib.py > /tmp/fliclib_before.py
+    bench/flic_wakeup.py --baseline /tmp/fliclib_before.py
+'''
+
+import argparse
+import threading
+import time
+
+from flicd import FakeFlicd, loadFliclib
+
+
+def benchmarkWakeup(fliclib, count, pingDelay):
+    '''
+    Returns: tuple Sorted latencies (in seconds) and whether `close()`
+        ended `handle_events`
+    '''
+
+    flicd = FakeFlicd(fliclib, pingDelay=pingDelay)
+    client = fliclib.FlicClient('127.0.0.1', flicd.port)
+    eventThread = threading.Thread(target=client.handle_events)
+    eventThread.start()
+
+    # let the event thread get to waiting for events
+    time.sleep(0.1)
+
+    latencies = []
+
+    for _ in range(count):
+        ran = threading.Event()
+        startTime = time.perf_counter()
+
+        client.run_on_handle_events_thread(ran.set)
+        ran.wait()
+
+        latencies.append(time.perf_counter() - startTime)
+
+    client.close()
+    eventThread.join(1)
+    hasClosed = not eventThread.is_alive()
+
+    # ends `handle_events` either way
+    flicd.close()
+    eventThread.join()
+
+    return sorted(latencies), hasClosed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split(
+        '\n\n')[0])
+    parser.add_argument('--baseline', help='fliclib.py to compare against')
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument(
+        '--flicd-latency',
+        type=float,
+        default=0.0,
+        help='milliseconds the stand-in flicd takes to answer a ping'
+    )
+    args = parser.parse_args()
+
+    fliclibs = [('current', loadFliclib())]
+
+    if args.baseline:
+        fliclibs.insert(0, ('baseline', loadFliclib(args.baseline)))
+
+    for label, fliclib in fliclibs:
+        latencies, hasClosed = benchmarkWakeup(
+            fliclib,
+            args.calls,
+            args.flicd_latency / 1000.0
+        )
+
+        print('{:<9} cross-thread call latency: median {:>8.1f} us   '
+              'p99 {:>8.1f} us{}'.format(
+                  label,
+                  latencies[len(latencies) // 2] * 1e6,
+                  latencies[int(len(latencies) * 0.99)] * 1e6,
+                  '' if hasClosed
+                  else '   (close() left handle_events blocked)'
+              ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+'''
+Helpers shared by the fliclib benchmarks: loading a fliclib module from any
+path (e.g. an older revision, to compare against), a local stand-in for
+flicd and canned packet streams like the ones a busy flicd sends
+'''
+
+import importlib.util
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+
+REPO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+FLICLIB_PATH = os.path.join(REPO_PATH, 'fliclib.py')
+BUTTON_ADDRESS = '80:e4:da:70:32:3b'
+
+sys.path.insert(0, REPO_PATH)
+
+
+def loadFliclib(path=None):
+    '''
+    Imports the fliclib module at `path`, without it taking the place of
+    the `fliclib` module
+
+    :param path: str|None Defaults to the repo's fliclib.py
+    '''
+
+    path = path or FLICLIB_PATH
+    name = 'fliclib_{}'.format(abs(hash(os.path.abspath(path))))
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return module
+
+
+def getEventOpcode(fliclib, eventName):
+    return [i[0] if i else None for i in fliclib.FlicClient._EVENTS].index(
+        eventName)
+
+
+def getCommandOpcode(fliclib, commandName):
+    return [i[0] for i in fliclib.FlicClient._COMMANDS].index(commandName)
+
+
+def encodeEvent(fliclib, eventName, *values):
+    '''
+    Returns: bytes The event as flicd sends it, length prefix included
+    '''
+
+    opcode = getEventOpcode(fliclib, eventName)
+    payload = bytes([opcode]) + struct.pack(
+        fliclib.FlicClient._EVENTS[opcode][1],
+        *values
+    )
+
+    return struct.pack('<H', len(payload)) + payload
+
+
+def getCannedPacketStream(fliclib, scanId, connId, count):
+    '''
+    Returns: list `count` framed events of a busy flicd - advertisement
+        packets of a running scanner interleaved with the button events of
+        a connection channel
+    '''
+
+    address = bytes(reversed(bytes.fromhex(BUTTON_ADDRESS.replace(':', ''))))
+    cycle = [
+        encodeEvent(fliclib, 'EvtAdvertisementPacket', scanId, address,
+                    b'F030', -60, False, True),
+        encodeEvent(fliclib, 'EvtButtonUpOrDown', connId, 0, 0, 3),
+        encodeEvent(fliclib, 'EvtAdvertisementPacket', scanId, address,
+                    b'F030', -61, False, True),
+        encodeEvent(fliclib, 'EvtButtonUpOrDown', connId, 1, 0, 3),
+        encodeEvent(fliclib, 'EvtButtonClickOrHold', connId, 2, 0, 3),
+        encodeEvent(fliclib, 'EvtButtonSingleOrDoubleClick', connId, 2, 0,
+                    3),
+        encodeEvent(fliclib, 'EvtButtonSingleOrDoubleClickOrHold', connId,
+                    2, 0, 3),
+    ]
+
+    return [cycle[i % len(cycle)] for i in range(count)]
+
+
+class FakeFlicd:
+    '''
+    Accepts a single client connection and answers its pings, like flicd
+    does - after `pingDelay` seconds, e.g. to stand in for a flicd on
+    another host. Whatever gets passed to `send` goes to the client as is.
+    '''
+
+    def __init__(self, fliclib, pingDelay=0.0):
+        self.fliclib = fliclib
+        self.pingDelay = pingDelay
+        self._server = socket.socket()
+        self._server.bind(('127.0.0.1', 0))
+        self._server.listen(1)
+        self._connection = None
+        self._connected = threading.Event()
+        self.port = self._server.getsockname()[1]
+
+        thread = threading.Thread(target=self._serve, name='fakeFlicd')
+        thread.daemon = True
+        thread.start()
+
+    def send(self, data):
+        self._connected.wait()
+        self._connection.sendall(data)
+
+    def close(self):
+        self._connected.wait()
+        self._connection.shutdown(socket.SHUT_RDWR)
+        self._connection.close()
+        self._server.close()
+
+    def _serve(self):
+        self._connection, _ = self._server.accept()
+        self._connected.set()
+
+        pingOpcode = getCommandOpcode(self.fliclib, 'CmdPing')
+        buffer = b''
+
+        while True:
+            try:
+                data = self._connection.recv(65536)
+            except OSError:
+                return
+
+            if not data:
+                return
+
+            buffer += data
+
+            while len(buffer) >= 2:
+                length = buffer[0] | buffer[1] << 8
+
+                if len(buffer) < 2 + length:
+                    break
+
+                command = buffer[2:2 + length]
+                buffer = buffer[2 + length:]
+
+                if command[0] == pingOpcode:
+                    pingId, = struct.unpack_from('<I', command, 1)
+
+                    if self.pingDelay:
+                        time.sleep(self.pingDelay)
+
+                    try:
+                        self.send(encodeEvent(
+                            self.fliclib,
+                            'EvtPingResponse',
+                            pingId
+                        ))
+                    except OSError:
+                        return
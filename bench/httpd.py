@@ -0,0 +1,83 @@
+'''
+Local stand-in HTTP server for the checks against services caster talks to
+over HTTP - the Spotify Web API and the servers of media URIs
+'''
+
+import http.server
+import os
+import sys
+import threading
+
+REPO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+sys.path.insert(0, REPO_PATH)
+
+
+class StandInRequestHandler(http.server.BaseHTTPRequestHandler):
+    '''
+    Keep-alive request handler that records the requests it gets on its
+    server, in `server.requests`, as `(method, path, rangeHeader, port)`
+    tuples - `port` being the client's, which tells connections apart
+    '''
+
+    protocol_version = 'HTTP/1.1'
+
+    def recordRequest(self):
+        with self.server.requestsLock:
+            self.server.requests.append((
+                self.command,
+                self.path,
+                self.headers.get('Range'),
+                self.client_address[1]
+            ))
+
+    def sendBody(self, status, body=b'', headers=None, includeBody=True):
+        self.send_response(status)
+
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+
+        if includeBody:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInHttpServer(http.server.ThreadingHTTPServer):
+    '''
+    Serves `handlerClass` on 127.0.0.1, on a free port, from a background
+    thread
+    '''
+
+    daemon_threads = True
+
+    def __init__(self, handlerClass):
+        super().__init__(('127.0.0.1', 0), handlerClass)
+
+        self.requests = []
+        self.requestsLock = threading.Lock()
+        self.baseUri = 'http://127.0.0.1:{}'.format(self.server_address[1])
+
+        thread = threading.Thread(
+            target=self.serve_forever,
+            name='standInHttpServer'
+        )
+        thread.daemon = True
+        thread.start()
+
+    def getRequests(self):
+        with self.requestsLock:
+            return list(self.requests)
+
+    def handle_error(self, request, clientAddress):
+        # clients hanging up on slow responses are expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, clientAddress)
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+'''
+Checks `caster.resolveMedia` against a stand-in media server: redirects get
+followed, content types get probed - with a HEAD request or, for servers
+that don't answer those, a ranged GET that stops at the headers - and fall
+back to the URI's extension when the server doesn't tell. Failed probes
+don't get cached, resolved URIs do.
+'''
+
+import argparse
+import logging
+import time
+
+from httpd import StandInHttpServer, StandInRequestHandler
+
+import caster
+
+# URIs the stand-in serves, and what they should resolve to
+MEDIA = (
+    ('/redirect', '/music/track', 'audio/mpeg'),
+    # an extensionless radio stream that doesn't answer HEAD requests
+    ('/radio', '/radio', 'audio/aac'),
+    ('/download/song.mp3', '/download/song.mp3', 'audio/mpeg'),
+    ('/missing.mp4', '/missing.mp4', 'video/mp4'),
+)
+UNREACHABLE_URI = 'http://127.0.0.1:1/song.mp3'
+SPOTIFY_URI = 'spotify:track:4uLU6hMCjMI75M1A2tKUQC'
+STREAM_DURATION = 5.0  # in seconds
+
+
+class MediaHandler(StandInRequestHandler):
+    def do_HEAD(self):
+        self.reply(includeBody=False)
+
+    def do_GET(self):
+        self.reply(includeBody=True)
+
+    def reply(self, includeBody):
+        self.recordRequest()
+
+        if self.path == '/redirect':
+            self.sendBody(302, headers={'Location': '/music/track'})
+        elif self.path == '/music/track':
+            self.sendBody(
+                200,
+                b'abc',
+                {'Content-Type': 'audio/mpeg; charset=binary'},
+                includeBody
+            )
+        elif self.path == '/radio' and self.command == 'HEAD':
+            self.sendBody(405)
+        elif self.path == '/radio':
+            self.streamRadio()
+        elif self.path == '/download/song.mp3':
+            self.sendBody(
+                200,
+                headers={'Content-Type': 'application/octet-stream'}
+            )
+        else:
+            self.sendBody(404)
+
+    def streamRadio(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'audio/aac')
+        self.end_headers()
+        self.close_connection = True
+
+        endTime = time.monotonic() + STREAM_DURATION
+
+        while time.monotonic() < endTime:
+            try:
+                self.wfile.write(b'\0' * 1024)
+            except OSError:
+                return
+
+            time.sleep(0.01)
+
+
+def checkPrefetch(server):
+    uris = [server.baseUri + i[0] for i in MEDIA]
+    startTime = time.perf_counter()
+
+    caster.prefetchMedia(uris + [UNREACHABLE_URI, SPOTIFY_URI])
+
+    duration = time.perf_counter() - startTime
+
+    # the radio stream mustn't get read beyond its headers
+    assert duration < STREAM_DURATION, duration
+
+    for uri, (_, resolvedPath, contentType) in zip(uris, MEDIA):
+        resolved = caster.resolveMedia(uri)
+
+        assert resolved == (server.baseUri + resolvedPath, contentType), \
+            (uri, resolved)
+
+    requests = server.getRequests()
+
+    assert ('GET', '/radio', 'bytes=0-0') in [i[:3] for i in requests], \
+        requests
+
+    print('prefetched {} media uris in {:.3f} s, with {} request(s)'.format(
+        len(uris) + 2,
+        duration,
+        len(requests)
+    ))
+
+
+def checkCache(server):
+    uris = [server.baseUri + i[0] for i in MEDIA]
+    requestCount = len(server.getRequests())
+    stats = caster._mediaResolutionCache.stats
+    startTime = time.perf_counter()
+
+    for uri in uris:
+        caster.resolveMedia(uri)
+
+    duration = time.perf_counter() - startTime
+    hits = caster._mediaResolutionCache.stats['hits'] - stats['hits']
+
+    assert len(server.getRequests()) == requestCount
+    assert hits == len(uris), hits
+
+    print('resolved them again from cache in {:.1f} us each'.format(
+        duration / len(uris) * 1e6))
+
+    # a failed probe gets retried, rather than cached
+    misses = caster._mediaResolutionCache.stats['misses']
+
+    assert caster.resolveMedia(UNREACHABLE_URI) == \
+        (UNREACHABLE_URI, 'audio/mpeg')
+    assert caster._mediaResolutionCache.stats['misses'] == misses + 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split(
+        '\n\n')[0])
+    parser.parse_args()
+
+    # warnings about the missing and unreachable URIs are expected
+    caster.logger.setLevel(logging.ERROR)
+
+    server = StandInHttpServer(MediaHandler)
+
+    try:
+        checkPrefetch(server)
+        checkCache(server)
+    finally:
+        server.close()
+
+
+if __name__ == '__main__':
+    main()
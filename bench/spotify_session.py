@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+
+'''
+Checks `caster.SpotifyRequestsSession` against a stand-in Spotify Web API
+that injects latency: healthy calls reuse one keep-alive connection, slow
+ones get cut off by the click latency budget and the request timeout, and
+the circuit breaker fails calls fast once the API looks degraded - until a
+trial call after its reset timeout succeeds.
+'''
+
+import argparse
+import json
+import logging
+import time
+
+import spotipy
+
+from httpd import StandInHttpServer, StandInRequestHandler
+
+import caster
+
+REQUEST_TIMEOUT = 0.5  # in seconds
+RESET_TIMEOUT = 1.0  # in seconds
+SLACK = 0.25  # in seconds
+
+
+class SpotifyApiHandler(StandInRequestHandler):
+    def do_GET(self):
+        self.recordRequest()
+        time.sleep(self.server.delay)
+        self.sendBody(
+            200,
+            json.dumps({'devices': []}).encode(),
+            {'Content-Type': 'application/json'}
+        )
+
+
+def setUpClient(server):
+    session = caster.SpotifyRequestsSession()
+    session.circuitBreaker.resetTimeout = RESET_TIMEOUT
+
+    client = spotipy.Spotify(
+        auth='token',
+        requests_session=session,
+        requests_timeout=REQUEST_TIMEOUT
+    )
+    client.prefix = server.baseUri + '/v1/'
+
+    return client, session
+
+
+def timeCall(client):
+    '''
+    Returns: tuple Seconds the call took, and the HTTP status it failed with
+        (None if it succeeded)
+    '''
+
+    startTime = time.perf_counter()
+
+    try:
+        client.devices()
+        status = None
+    except spotipy.client.SpotifyException as e:
+        status = e.http_status
+
+    return time.perf_counter() - startTime, status
+
+
+def checkKeepAlive(server, count):
+    server.delay = 0.0
+    client, _ = setUpClient(server)
+    requestCount = len(server.getRequests())
+
+    for _ in range(count):
+        assert timeCall(client)[1] is None
+
+    requests = server.getRequests()[requestCount:]
+    connectionCount = len(set(i[3] for i in requests))
+
+    assert len(requests) == count, requests
+    assert connectionCount == 1, requests
+
+    print('{} healthy calls over {} connection(s)'.format(
+        count,
+        connectionCount
+    ))
+
+
+def checkLatencyBudget(server, budget):
+    server.delay = REQUEST_TIMEOUT * 4
+    client, _ = setUpClient(server)
+    requestCount = len(server.getRequests())
+
+    with caster.latencyBudget(budget):
+        duration, status = timeCall(client)
+
+        assert status == 504, status
+        assert budget <= duration < budget + SLACK, duration
+
+        print('slow call within a {:.2f} s budget: failed after '
+              '{:.3f} s'.format(budget, duration))
+
+        duration, status = timeCall(client)
+
+        assert status == 504, status
+        assert duration < SLACK, duration
+
+        print('call after the budget got used up: failed after '
+              '{:.3f} s'.format(duration))
+
+    assert len(server.getRequests()) == requestCount + 1
+
+
+def checkCircuitBreaker(server):
+    server.delay = REQUEST_TIMEOUT * 4
+    client, session = setUpClient(server)
+    breaker = session.circuitBreaker
+
+    for _ in range(breaker.failureThreshold):
+        duration, status = timeCall(client)
+
+        assert status == 504, status
+        assert REQUEST_TIMEOUT <= duration < REQUEST_TIMEOUT + SLACK, \
+            duration
+
+    assert breaker.isOpen
+
+    print('{} slow calls: each failed after the {:.2f} s request '
+          'timeout'.format(breaker.failureThreshold, REQUEST_TIMEOUT))
+
+    requestCount = len(server.getRequests())
+    duration, status = timeCall(client)
+
+    assert status == 503, status
+    assert duration < SLACK, duration
+    assert len(server.getRequests()) == requestCount
+
+    print('call with the breaker open: failed after {:.3f} s'.format(
+        duration))
+
+    server.delay = 0.0
+    time.sleep(RESET_TIMEOUT)
+
+    duration, status = timeCall(client)
+
+    assert status is None, status
+    assert not breaker.isOpen
+    assert timeCall(client)[1] is None
+
+    print('trial call after the reset timeout: succeeded after '
+          '{:.3f} s'.format(duration))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split(
+        '\n\n')[0])
+    parser.add_argument('--calls', type=int, default=10)
+    parser.add_argument(
+        '--budget',
+        type=float,
+        default=REQUEST_TIMEOUT / 2,
+        help='click latency budget, in seconds'
+    )
+    args = parser.parse_args()
+
+    logging.getLogger('spotipy').setLevel(logging.CRITICAL)
+
+    server = StandInHttpServer(SpotifyApiHandler)
+
+    try:
+        checkKeepAlive(server, args.calls)
+        checkLatencyBudget(server, args.budget)
+        checkCircuitBreaker(server)
+    finally:
+        server.close()
+
+
+if __name__ == '__main__':
+    main()
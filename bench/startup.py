@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+
+'''
+Measures how long `caster.setup` takes until the first click could play, on
+a cold start (no device hosts cache) and on a warm one (hosts cached by an
+earlier run). Devices get announced by a local mDNS responder on 127.0.0.1,
+and Spotify setup is skipped - only device host setup gets timed.
+
+Each start runs in a fresh process, as caster keeps its device host registry
+in module state. Pass --scan-timeout to keep the cold start with nothing
+answering short.
+'''
+
+import argparse
+import functools
+import json
+import logging
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+DEVICE_NAME = 'Kitchen'
+DEVICE_UUID = '0123456789abcdef0123456789abcdef'
+INTERFACES = ['127.0.0.1']
+
+sys.path.insert(0, REPO_PATH)
+
+
+def getDeviceServiceInfo(zeroconf, serviceType):
+    return zeroconf.ServiceInfo(
+        serviceType,
+        '{}-{}.{}'.format(DEVICE_NAME, DEVICE_UUID[:8], serviceType),
+        addresses=[socket.inet_aton('127.0.0.1')],
+        port=8009,
+        properties={
+            b'fn': DEVICE_NAME.encode(),
+            b'id': DEVICE_UUID.encode(),
+            b'md': b'Google Home',
+        },
+        server='{}.local.'.format(DEVICE_NAME.lower())
+    )
+
+
+def writeDeviceHostsCache(path):
+    with open(path, 'w') as f:
+        json.dump({'hosts': [{
+            'host': '127.0.0.1',
+            'port': 8009,
+            'uuid': DEVICE_UUID,
+            'modelName': 'Google Home',
+            'friendlyName': DEVICE_NAME,
+            'lastSeen': time.time(),
+        }]}, f)
+
+
+def runStart(mode, scanTimeout):
+    '''
+    Sets up caster once, in this process
+
+    :param mode: str `cold`, `cold-silent` (nothing answers mDNS) or `warm`
+
+    Returns: float Seconds from `caster.setup` being called to it returning
+    '''
+
+    import zeroconf
+    import caster
+
+    caster._setupSpotifyClient = lambda: None
+    caster._setupSpotifyControllerToken = lambda: None
+    caster.scanForDeviceHosts = functools.partial(
+        caster.scanForDeviceHosts,
+        scanTimeout
+    )
+    caster.DEVICE_HOSTS_CACHE_PATH = os.path.join(
+        tempfile.mkdtemp(), '.device-hosts')
+
+    responder = zeroconf.Zeroconf(interfaces=INTERFACES)
+
+    if mode == 'cold-silent':
+        # the scan is expected to come up empty
+        caster.logger.setLevel(logging.CRITICAL)
+    else:
+        responder.register_service(
+            getDeviceServiceInfo(zeroconf, caster.CAST_SERVICE_TYPE))
+
+    if mode == 'warm':
+        writeDeviceHostsCache(caster.DEVICE_HOSTS_CACHE_PATH)
+
+    # keep the device browser off the real network
+    zeroconf.Zeroconf = functools.partial(
+        zeroconf.Zeroconf,
+        interfaces=INTERFACES
+    )
+
+    startTime = time.perf_counter()
+    caster.setup()
+    duration = time.perf_counter() - startTime
+
+    if mode != 'cold-silent':
+        assert caster.getDeviceHost(DEVICE_NAME) is not None
+
+    caster.cancelDeviceHostScanner()
+    responder.close()
+
+    return duration
+
+
+def benchmarkStartup(mode, rounds, scanTimeout):
+    '''
+    Returns: float Median seconds to set up, over `rounds` fresh processes
+    '''
+
+    durations = []
+
+    for _ in range(rounds):
+        output = subprocess.check_output([
+            sys.executable,
+            os.path.abspath(__file__),
+            '--run', mode,
+            '--scan-timeout', str(scanTimeout),
+        ])
+        durations.append(float(output))
+
+    return statistics.median(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split(
+        '\n\n')[0])
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument(
+        '--scan-timeout',
+        type=float,
+        default=15.0,
+        help='seconds a cold start waits for a first device host'
+    )
+    parser.add_argument(
+        '--run',
+        choices=('cold', 'cold-silent', 'warm'),
+        help=argparse.SUPPRESS
+    )
+    args = parser.parse_args()
+
+    if args.run:
+        print(runStart(args.run, args.scan_timeout))
+        return
+
+    for mode, label in (
+        ('cold-silent', 'cold, nothing answering mDNS'),
+        ('cold', 'cold, responder up'),
+        ('warm', 'warm, cache present'),
+    ):
+        print('{:<30} {:>9.1f} ms'.format(
+            label,
+            benchmarkStartup(mode, args.rounds, args.scan_timeout) * 1000
+        ))
+
+
+if __name__ == '__main__':
+    main()
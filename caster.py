@@ -11,27 +11,97 @@ from pychromecast.controllers.media import (  # noqa: F401
 )
 
 from pychromecast.controllers.spotify import SpotifyController
+from pychromecast.discovery import CastListener
+import zeroconf
 from mimetypes import MimeTypes
 import logging
 import threading
-from datetime import datetime, timedelta
-from util import formatTimeDelta
+from datetime import datetime
+from util import (
+    JOB_DROPPED,
+    formatTimeDelta,
+    writeFileAtomically,
+    InitTasks,
+    TtlCache,
+    CircuitBreaker,
+    CoalescingWorker
+)
 import os
+import json
+import functools
+import requests
+import urllib3
 import spotipy
 import spotify_token
-from time import time
+import concurrent.futures
+from contextlib import contextmanager
+from collections import namedtuple
+from time import time, monotonic
+from uuid import UUID
 
 logging.getLogger('pychromecast').setLevel(logging.WARN)
 
 logger = logging.getLogger(__name__)
 onError = lambda error: None  # noqa: E731
-deviceHosts = []
-deviceHostScanTimer = None
+_deviceHostsByServiceName = {}
+_deviceHostsByName = {}
+_deviceHostsByUuid = {}
+_deviceHostsLock = threading.Lock()
+_deviceHostsChanged = threading.Condition(_deviceHostsLock)
+_deviceHostsFound = threading.Event()
+_deviceHostsCache = {}
+_deviceHostsCacheWriteLock = threading.Lock()
+_deviceBrowser = None
+_deviceBrowserZeroconf = None
+_ownsDeviceBrowserZeroconf = False
 _spotifyClient = None
+_spotifyStateCache = TtlCache(name='Spotify state')
+_latencyBudgets = threading.local()
+_mimeTypes = MimeTypes()
+_mediaProbeSession = requests.Session()
+_mediaResolutionCache = TtlCache(name='media resolution')
+_spotifyOAuthTokenRefreshLock = threading.Lock()
+_spotifyOAuthTokenRefreshTimer = None
+_spotifyOAuthTokenRefreshFailureStreak = 0
+_spotifyOAuthTokenRefreshStats = {
+    'lastRefreshLatency': None,
+    'refreshCount': 0,
+    'refreshFailureCount': 0,
+}
+_spotifyDeviceIdsByName = {}
+_spotifyDeviceIdsByUuid = {}
+_spotifyDeviceIdsLock = threading.Lock()
+_hasLoadedSpotifyDeviceIds = False
+_spotifyControllerToken = None
+_spotifyControllerTokenLock = threading.Lock()
+_spotifyControllerTokenRefreshTimer = None
+_spotifyControllerTokenFailureStreak = 0
+_devicePool = {}
+_devicePoolLock = threading.Lock()
+_devicePoolHealthCheckTimer = None
+_isDevicePoolClosed = False
+_devicePlayerStatusListeners = {}
+_deviceStates = {}
+_deviceStatesLock = threading.Lock()
+_deviceTeardowns = {}
+_deviceTeardownsLock = threading.Lock()
+_lastStopLatencies = None
 
 DEVICE_HOST_SCAN_TIMEOUT = 15.0  # in seconds
-CONTINUOUS_DEVICE_HOST_SCAN_INTERVAL = 900.0  # in seconds
+CAST_SERVICE_TYPE = '_googlecast._tcp.local.'
+DEVICE_HOSTS_CACHE_PATH = os.path.join(
+    os.path.dirname(__file__), '.device-hosts')
+DEVICE_HOSTS_CACHE_MAX_AGE = 30 * 24 * 3600.0  # in seconds
+CACHED_DEVICE_HOST_KEY_PREFIX = 'cached:'
 WAIT_FOR_PLAYBACK_TIMEOUT = 10.0  # in seconds
+MEDIA_STATUS_COALESCE_WINDOW = 0.25  # in seconds
+MEDIA_STATUS_QUEUE_SIZE = 16
+STOP_TEARDOWN_DEADLINE = 5.0  # in seconds
+DEVICE_CONNECT_TIMEOUT = 10.0  # in seconds
+VOLUME_PRESETS_TIMEOUT = 10.0  # in seconds
+MULTI_DEVICE_START_DEADLINE = 8.0  # in seconds
+DEVICE_POOL_IDLE_TIMEOUT = 1800.0  # in seconds
+DEVICE_POOL_HEALTH_CHECK_INTERVAL = 60.0  # in seconds
 SPOTIFY_OAUTH_TOKENS_CACHE_PATH = os.path.join(
     os.path.dirname(__file__), '.spotify-tokens')
 SPOTIFY_OAUTH_SCOPE = ','.join((
@@ -40,6 +110,26 @@ SPOTIFY_OAUTH_SCOPE = ','.join((
     'user-read-currently-playing',
 ))
 SPOTIFY_OAUTH_REDIRECT_SERVER_PORT = 5000
+SPOTIFY_OAUTH_TOKEN_REFRESH_MARGIN = 300.0  # in seconds
+SPOTIFY_OAUTH_TOKEN_REFRESH_RETRY_INTERVAL = 30.0  # in seconds
+SPOTIFY_OAUTH_TOKEN_REFRESH_MAX_RETRY_INTERVAL = 3600.0  # in seconds
+SPOTIFY_CONTROLLER_TOKEN_CACHE_PATH = os.path.join(
+    os.path.dirname(__file__), '.spotify-controller-token')
+SPOTIFY_CONTROLLER_TOKEN_REFRESH_MARGIN = 600.0  # in seconds
+SPOTIFY_CONTROLLER_TOKEN_MIN_VALIDITY = 60.0  # in seconds
+SPOTIFY_CONTROLLER_TOKEN_RETRY_INTERVAL = 60.0  # in seconds
+SPOTIFY_CONTROLLER_TOKEN_MAX_RETRY_INTERVAL = 3600.0  # in seconds
+SPOTIFY_DEVICE_IDS_CACHE_PATH = os.path.join(
+    os.path.dirname(__file__), '.spotify-device-ids')
+SPOTIFY_HTTP_POOL_SIZE = 4
+SPOTIFY_HTTP_CONNECT_RETRIES = 1
+SPOTIFY_REQUEST_TIMEOUT = 3.0  # in seconds
+SPOTIFY_CIRCUIT_BREAKER_FAILURE_THRESHOLD = 3
+SPOTIFY_CIRCUIT_BREAKER_RESET_TIMEOUT = 30.0  # in seconds
+SPOTIFY_PLAYBACK_STATE_CACHE_TTL = 2.0  # in seconds
+MEDIA_RESOLUTION_CACHE_TTL = 600.0  # in seconds
+MEDIA_PROBE_TIMEOUT = 3.0  # in seconds
+SPOTIFY_DEVICES_CACHE_TTL = 5.0  # in seconds
 
 
 class DeviceNotFoundError(Exception):
@@ -54,6 +144,246 @@ class SpotifyPlaybackError(Exception):
     pass
 
 
+class SpotifyUnavailableError(spotipy.client.SpotifyException):
+    '''
+    Raised instead of making a Spotify Web API request when the caller's
+    latency budget has run out or the API looks degraded
+    '''
+
+    pass
+
+
+class SpotifyRequestsSession(requests.Session):
+    '''
+    Keep-alive session for the Spotify Web API and accounts service. Bounds
+    each request by the calling thread's latency budget (see
+    `latencyBudget`) and fails fast while the API looks degraded.
+    '''
+
+    def __init__(self,
+                 poolSize=SPOTIFY_HTTP_POOL_SIZE,
+                 connectRetries=SPOTIFY_HTTP_CONNECT_RETRIES):
+        super().__init__()
+
+        self.circuitBreaker = CircuitBreaker(
+            name='Spotify Web API',
+            failureThreshold=SPOTIFY_CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+            resetTimeout=SPOTIFY_CIRCUIT_BREAKER_RESET_TIMEOUT
+        )
+
+        # only retry connecting - a retried read could double the time a
+        # slow response takes
+        adapter = requests.adapters.HTTPAdapter(
+            pool_maxsize=poolSize,
+            max_retries=urllib3.Retry(
+                total=connectRetries,
+                connect=connectRetries,
+                read=False,
+                backoff_factor=0.1
+            )
+        )
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def request(self, method, url, **kwargs):
+        remainingLatencyBudget = _getRemainingLatencyBudget()
+
+        if remainingLatencyBudget is not None:
+            if remainingLatencyBudget <= 0:
+                raise SpotifyUnavailableError(
+                    504,
+                    -1,
+                    'Latency budget used up before {} {}'.format(method, url)
+                )
+
+            timeout = kwargs.get('timeout')
+            kwargs['timeout'] = remainingLatencyBudget if timeout is None \
+                else min(timeout, remainingLatencyBudget)
+
+        if not self.circuitBreaker.allowRequest():
+            raise SpotifyUnavailableError(
+                503,
+                -1,
+                'Spotify Web API looks degraded - not requesting {} {}'.format(
+                    method,
+                    url
+                )
+            )
+
+        try:
+            response = super().request(method, url, **kwargs)
+        except (requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout) as e:
+            self.circuitBreaker.recordFailure()
+
+            raise SpotifyUnavailableError(
+                504,
+                -1,
+                '{} {} failed: {}'.format(method, url, e)
+            )
+        except Exception:
+            self.circuitBreaker.recordFailure()
+            raise
+
+        if response.status_code >= 500 or response.status_code == 429:
+            self.circuitBreaker.recordFailure()
+        else:
+            self.circuitBreaker.recordSuccess()
+
+        return response
+
+
+class SpotifyTokensCacheHandler(spotipy.cache_handler.CacheFileHandler):
+    '''
+    Keeps the Spotify OAuth tokens in memory, rather than reading the cache
+    file on every Web API call, and writes the file atomically
+    '''
+
+    def __init__(self, cachePath):
+        super().__init__(cache_path=cachePath)
+
+        self._lock = threading.Lock()
+        self._tokenInfo = None
+        self._hasReadCacheFile = False
+
+    def get_cached_token(self):
+        with self._lock:
+            if not self._hasReadCacheFile:
+                self._tokenInfo = super().get_cached_token()
+                self._hasReadCacheFile = True
+
+            return self._tokenInfo
+
+    def save_token_to_cache(self, token_info):
+        with self._lock:
+            self._tokenInfo = token_info
+            self._hasReadCacheFile = True
+
+            try:
+                writeFileAtomically(
+                    self.cache_path,
+                    json.dumps(token_info),
+                    mode=0o600
+                )
+            except OSError:
+                logger.exception(
+                    'Error: Failed to write Spotify OAuth tokens cache')
+
+
+class DeviceHostListener(CastListener):
+    '''
+    Keeps the device host registry up to date as cast services appear,
+    change or disappear on the network
+    '''
+
+    def __init__(self):
+        super().__init__(
+            add_callback=self._onServiceAdded,
+            remove_callback=self._onServiceRemoved
+        )
+
+    def update_service(self, zconf, typ, name):
+        self.add_service(zconf, typ, name)
+
+    def _onServiceAdded(self, serviceName):
+        host = self.services.get(serviceName)
+
+        if host is not None:
+            _addDeviceHost(serviceName, host)
+
+    def _onServiceRemoved(self, serviceName, host):
+        _removeDeviceHost(serviceName)
+
+
+class DeviceState(namedtuple('DeviceState', (
+        'name',
+        'appId',
+        'volumeLevel',
+        'playerState',
+        'streamType',
+        'contentId',
+        'spotifyIsPlaying',
+        'castStatusUpdatedAt',
+        'mediaStatusUpdatedAt',
+        'spotifyStateUpdatedAt',
+))):
+    '''
+    Snapshot of what a device is up to, merged from its CastV2 receiver and
+    media status updates and from the Spotify playback state. The
+    `...UpdatedAt` timestamps (from `time()`, None if never updated) tell
+    how stale each part is.
+    '''
+
+    __slots__ = ()
+
+    @property
+    def isPlaying(self):
+        return bool(self.spotifyIsPlaying) or self.playerState in (
+            MEDIA_PLAYER_STATE_PLAYING,
+            MEDIA_PLAYER_STATE_BUFFERING
+        )
+
+    @property
+    def isPaused(self):
+        return self.playerState == MEDIA_PLAYER_STATE_PAUSED
+
+
+class DeviceStartResult(namedtuple('DeviceStartResult', (
+        'deviceName',
+        'device',
+        'startLatency',
+        'startSkew',
+        'error',
+        'skipped',
+))):
+    '''
+    Outcome of starting playback on one of the devices of `playOnDevices`.
+    `device` is None if it failed (see `error`), missed the start deadline
+    or got `skipped` - Spotify plays on one device at a time. `startLatency`
+    and `startSkew` (how much later than the first device it started) are in
+    seconds.
+    '''
+
+    __slots__ = ()
+
+    @property
+    def hasStarted(self):
+        return self.device is not None
+
+
+class DeviceStateListener:
+    '''
+    Keeps the state shadow of a device (see `getDeviceState`) up to date
+    with its CastV2 status updates
+    '''
+
+    def __init__(self, deviceName):
+        self.deviceName = deviceName
+
+    def new_cast_status(self, status):
+        if status is None:
+            return
+
+        _updateDeviceState(
+            self.deviceName,
+            appId=status.app_id,
+            volumeLevel=status.volume_level,
+            castStatusUpdatedAt=time()
+        )
+
+    def new_media_status(self, status):
+        if status is None:
+            return
+
+        _updateDeviceState(
+            self.deviceName,
+            playerState=status.player_state,
+            streamType=status.stream_type,
+            contentId=status.content_id,
+            mediaStatusUpdatedAt=time()
+        )
+
+
 class DeviceStatusListener:
     def __init__(self, device, callback):
         self.device = device
@@ -75,11 +405,21 @@ class DeviceMediaStatusListener:
         self.lastPlayerState = None
 
     def new_media_status(self, status):
-        logger.debug('Device "{}" got new media status: {}'.format(
-            self.device.name,
-            status
-        ))
+        # called on the device's socket thread, which must not get held up
+        # by the callback - leave it to the media status worker
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Device "{}" got new media status: {}'.format(
+                self.device.name,
+                status
+            ))
+
+        if _mediaStatusWorker.submit(self, status) == JOB_DROPPED:
+            logger.warning(
+                'Too many media status updates waiting - dropped one '
+                'of "{}"'.format(self.device.name)
+            )
 
+    def handleMediaStatus(self, status):
         if self.lastPlayerState and \
                 self.lastPlayerState == status.player_state:
             return
@@ -89,7 +429,23 @@ class DeviceMediaStatusListener:
         self.callback(self.device, status)
 
 
-def setup(logLevel=None, errorHandler=None):
+_mediaStatusWorker = CoalescingWorker(
+    lambda listener, status: listener.handleMediaStatus(status),
+    window=MEDIA_STATUS_COALESCE_WINDOW,
+    maxSize=MEDIA_STATUS_QUEUE_SIZE,
+    name='mediaStatus'
+)
+
+
+def setup(logLevel=None, errorHandler=None, initTasks=None):
+    '''
+    Sets up the Spotify client and device discovery concurrently
+
+    :param initTasks: util.InitTasks Tasks to add the setup tasks to, for the
+        caller to run alongside its own ones - when not given, setup runs
+        its tasks and blocks until they're done
+    '''
+
     global onError
 
     if logLevel:
@@ -100,279 +456,1181 @@ def setup(logLevel=None, errorHandler=None):
     if errorHandler:
         onError = errorHandler
 
-    _setupSpotifyClient()
+    ownsInitTasks = initTasks is None
 
-    if not scanForDeviceHosts():
-        logger.error('Setup completed with failing scanner')
-    else:
-        logger.info('Setup completed')
+    if ownsInitTasks:
+        initTasks = InitTasks(name='Caster setup')
 
+    initTasks.add('Spotify client', _setupSpotifyClient)
+    # only needed for playing Spotify URIs - no need to wait for it
+    initTasks.add(
+        'Spotify controller token',
+        _setupSpotifyControllerToken,
+        required=False
+    )
+    initTasks.add('device hosts', _setupDeviceHosts)
 
-def scanForDeviceHosts():
-    '''
-    Returns: Bool Whether scanner returned any device hosts or not
+    if not ownsInitTasks:
+        return
+
+    initTasks.start()
+
+    if not initTasks.wait():
+        raise initTasks.error
+
+    logger.info('Setup completed')
+
+
+def _setupDeviceHosts():
+    cachedDeviceHostCount = _loadDeviceHostsCache()
+
+    if cachedDeviceHostCount:
+        # cached hosts get validated on first use - let the browser
+        # catch up with any changes in the background meanwhile
+        try:
+            startDeviceBrowser()
+        except (OSError, zeroconf.Error) as e:
+            logger.exception('Error: Failed to start device browser')
+            onError(e)
+
+        logger.info(
+            'Using {} cached device host(s)'.format(cachedDeviceHostCount)
+        )
+    elif not scanForDeviceHosts():
+        logger.error('Device host setup completed with failing scanner')
+
+
+def scanForDeviceHosts(timeout=DEVICE_HOST_SCAN_TIMEOUT):
     '''
+    Starts the background device browser, if not already running, and waits
+    for it to find at least one device host
 
-    global deviceHosts, deviceHostScanTimer
+    :param timeout: float Max seconds to wait for the first device host
 
-    # cancel currently running scanner, if any
-    cancelDeviceHostScanner()
+    Returns: Bool Whether scanner returned any device hosts or not
+    '''
 
     logger.debug('Scanning for device hosts...')
 
     startTime = datetime.utcnow()
-    deviceHosts = pychromecast.discover_chromecasts(
-        timeout=DEVICE_HOST_SCAN_TIMEOUT
-    )
 
-    formattedScanTime = formatTimeDelta(datetime.utcnow() - startTime)
-    formattedNextScanTimestamp = (
-        datetime.utcnow() +
-        timedelta(seconds=CONTINUOUS_DEVICE_HOST_SCAN_INTERVAL)
-    ).isoformat()
+    try:
+        startDeviceBrowser()
+    except (OSError, zeroconf.Error) as e:
+        logger.exception('Error: Failed to start device browser')
+        onError(e)
+        return False
+
+    gotAcceptableSetOfHosts = _deviceHostsFound.wait(timeout)
 
-    gotAcceptableSetOfHosts = deviceHosts is not None and len(deviceHosts) > 0
+    formattedScanTime = formatTimeDelta(datetime.utcnow() - startTime)
 
     if not gotAcceptableSetOfHosts:
         logger.error(
             'Device host scan completed with no hosts found after {}. '
-            'Scheduling next scan for {}.'.format(
-                formattedScanTime,
-                formattedNextScanTimestamp
+            'Device browser keeps listening in the background.'.format(
+                formattedScanTime
             )
         )
 
-        cancelDeviceHostScanner()
         onError(
             Exception('Device host scan completed with no device(s) found.')
         )
     else:
         logger.info(
             'Device scan completed with {} device(s) found after {}. '
-            'Scheduling next scan for {}.'.format(
-                len(deviceHosts),
-                formattedScanTime,
-                formattedNextScanTimestamp
+            'Device browser keeps listening in the background.'.format(
+                len(getDeviceHosts()),
+                formattedScanTime
             )
         )
 
-    # continue to scan every N seconds
-    deviceHostScanTimer = threading.Timer(
-        CONTINUOUS_DEVICE_HOST_SCAN_INTERVAL,
-        scanForDeviceHosts
-    )
-    deviceHostScanTimer.daemon = True
-    deviceHostScanTimer.start()
-
     return gotAcceptableSetOfHosts
 
 
-def cancelDeviceHostScanner():
-    global deviceHostScanTimer
+def startDeviceBrowser(zeroconfInstance=None):
+    '''
+    Starts browsing for cast devices in the background. Found devices are
+    added to (and vanished ones removed from) the device host registry
+    as they come and go.
 
-    if deviceHostScanTimer is not None and deviceHostScanTimer.is_alive():
-        logger.debug('Canceling device host scanner')
-        deviceHostScanTimer.cancel()
-        deviceHostScanTimer = None
+    :param zeroconfInstance: zeroconf.Zeroconf Instance to browse with -
+        creates (and later closes) one if not given
+    '''
 
+    global _deviceBrowser, _deviceBrowserZeroconf, \
+        _ownsDeviceBrowserZeroconf
 
-def getDevice(deviceName, calledFromSelf=False):
-    if not calledFromSelf:
-        logger.debug('Getting device "{}"'.format(deviceName))
+    with _deviceHostsLock:
+        if _deviceBrowser is not None:
+            return
 
-    try:
-        host = next(i for i in deviceHosts if i[-1] == deviceName)
-        device = pychromecast.Chromecast(host[0], host[1])
-    except StopIteration:
-        if not calledFromSelf:
-            logger.warning(
-                'Device "{}" not found - trigger new device scan'.format(
-                    deviceName
-                )
-            )
+        if zeroconfInstance is None:
+            _deviceBrowserZeroconf = zeroconf.Zeroconf()
+            _ownsDeviceBrowserZeroconf = True
+        else:
+            _deviceBrowserZeroconf = zeroconfInstance
+            _ownsDeviceBrowserZeroconf = False
 
-            scanForDeviceHosts()
+        logger.debug('Starting device browser')
 
-            return getDevice(deviceName, calledFromSelf=True)
-        else:
-            logger.warning(
-                'Device "{}" not found (tried scanning anew)'.format(
-                    deviceName
-                )
-            )
+        _deviceBrowser = zeroconf.ServiceBrowser(
+            _deviceBrowserZeroconf,
+            CAST_SERVICE_TYPE,
+            DeviceHostListener()
+        )
 
-            raise DeviceNotFoundError(
-                'Device "{}" not found'.format(deviceName)
-            )
 
-    # start worker thread and wait for cast device to be ready
-    logger.debug('Device "{}" found, connecting...'.format(deviceName))
+def cancelDeviceHostScanner():
+    global _deviceBrowser, _deviceBrowserZeroconf
 
-    device.wait()
+    with _deviceHostsLock:
+        browser = _deviceBrowser
+        zeroconfInstance = _deviceBrowserZeroconf
+        ownsZeroconf = _ownsDeviceBrowserZeroconf
+        _deviceBrowser = None
+        _deviceBrowserZeroconf = None
 
-    logger.debug('Connected to "{}"'.format(deviceName))
+    if browser is None:
+        return
 
-    return device
+    logger.debug('Canceling device browser')
 
+    browser.cancel()
 
-def stop(device, disconnectFromDevice=False):
-    if not device:
-        return
+    if ownsZeroconf:
+        zeroconfInstance.close()
 
-    logger.info('Stopping playback on "{}"'.format(device.name))
 
-    try:
-        _pauseSpotify()
-    except (Exception, SpotifyPlaybackError):
-        logger.exception('Failed to pause Spotify playback')
+def getDeviceHosts():
+    '''
+    Returns: list Snapshot of known device hosts as
+        `(host, port, uuid, modelName, friendlyName)` tuples
+    '''
 
-    try:
-        device.media_controller.stop()
-    except pychromecast.error.ControllerNotRegistered as e:
-        logger.error('Failed to stop: {}'.format(e))
-        onError(e)
-        return
+    with _deviceHostsLock:
+        return list(_deviceHostsByServiceName.values())
 
-    if disconnectFromDevice:
-        logger.info(
-            'Playback stopped on "{}" - disconnecting..'.format(device.name)
-        )
-        device.disconnect(blocking=False)
 
+def getDeviceHost(deviceNameOrUuid):
+    '''
+    :param deviceNameOrUuid: str Friendly name or UUID of the device
 
-def quit(device, disconnectFromDevice=False):
-    if not device:
-        return
+    Returns: tuple|None `(host, port, uuid, modelName, friendlyName)`
+    '''
 
-    logger.info('Closing Chromecast application on "{}"'.format(device.name))
+    with _deviceHostsLock:
+        host = _deviceHostsByName.get(deviceNameOrUuid)
 
-    try:
-        if device.app_id:
-            device.quit_app()
-        else:
-            logger.info(
-                ' - no Chromecast application active '
-                'on "{}"!'.format(device.name)
-            )
-    except pychromecast.error.ControllerNotRegistered as e:
-        logger.error('Failed to quit: {}'.format(e))
-        onError(e)
-        return
+        if host is None:
+            host = _deviceHostsByUuid.get(str(deviceNameOrUuid))
 
-    if disconnectFromDevice:
-        logger.info('Disconnecting from "{}"'.format(device.name))
-        device.disconnect(blocking=False)
+        return host
 
 
-def setVolume(device, volume, callback=None, disconnectFromDevice=False):
-    if not device:
-        return
+def _addDeviceHost(serviceName, host):
+    with _deviceHostsLock:
+        previousHost = _deviceHostsByServiceName.get(serviceName)
 
-    logger.info(
-        'Setting volume to {}% on "{}"'.format(
-            volume * 100,
-            device.name
-        )
-    )
+        if previousHost is not None:
+            _unindexDeviceHost(previousHost)
 
-    try:
-        device.set_volume(volume)
-    except pychromecast.error.ControllerNotRegistered as e:
-        logger.error('Failed to set volume: {}'.format(e))
-        onError(e)
-        return
+        if not serviceName.startswith(CACHED_DEVICE_HOST_KEY_PREFIX):
+            # the live host supersedes whatever we had cached for it
+            cachedHost = _deviceHostsByServiceName.pop(
+                CACHED_DEVICE_HOST_KEY_PREFIX + host[4], None)
 
-    if callback is not None:
-        logger.info(
-            'Volume set on "{}" - disconnecting...'.format(device.name)
-        )
-        device.disconnect()
+            if cachedHost is not None:
+                _unindexDeviceHost(cachedHost)
 
-    if disconnectFromDevice:
-        logger.info(
-            'Volume set on "{}" - disconnecting...'.format(device.name)
-        )
-        device.disconnect()
+        _deviceHostsByServiceName[serviceName] = host
+        _deviceHostsByName[host[4]] = host
 
+        if host[2] is not None:
+            _deviceHostsByUuid[str(host[2])] = host
 
-def isPlaying(device):
-    if not device:
-        return False
+        _deviceHostsChanged.notify_all()
 
-    try:
-        return isSpotifyPlaying(device) or \
-            device.media_controller.status.player_is_playing
-    except pychromecast.error.ControllerNotRegistered as e:
-        logger.error('Failed to get `isPlaying`: {}'.format(e))
-        onError(e)
-        return False
+    if previousHost != host:
+        logger.info('Found device "{}" at {}:{}'.format(
+            host[4], host[0], host[1]))
 
+        if not serviceName.startswith(CACHED_DEVICE_HOST_KEY_PREFIX):
+            _cacheDeviceHost(host)
 
-def isSpotifyPlaying(device):
-    if not device:
-        return False
+    _deviceHostsFound.set()
 
-    if not _spotifyClient:
-        return False
 
-    try:
-        playbackStatus = _spotifyClient.current_playback()
-    except spotipy.client.SpotifyException:
-        logger.exception(
-            'Error: Failed to get current Spotify playback status'
-            ' - got Spotify error'
-        )
-        return False
+def _removeDeviceHost(serviceName):
+    with _deviceHostsLock:
+        host = _deviceHostsByServiceName.pop(serviceName, None)
 
-    if not playbackStatus:
-        return False
+        if host is None:
+            return
 
-    if playbackStatus.get('is_playing') and \
-            playbackStatus.get('device', {}).get('name') != device.name:
-        logger.warning(
-            'isSpotifyPlaying: Spotify playback status indicates '
-            'a device ({}) currently playing but with different '
-            'device name from the one specified ({}) - considering '
-            'playback status as "not playing"'.format(
-                playbackStatus.get('device', {}).get('name'),
-                device.name
-            )
-        )
-        return False
+        _unindexDeviceHost(host)
 
-    return playbackStatus.get('is_playing', False)
+    logger.info('Device "{}" went away'.format(host[4]))
 
 
-def isPaused(device):
-    if not device:
-        return False
+def _unindexDeviceHost(host):
+    if _deviceHostsByName.get(host[4]) is host:
+        del _deviceHostsByName[host[4]]
 
-    try:
-        return device.media_controller.status.player_is_paused
-    except pychromecast.error.ControllerNotRegistered as e:
-        logger.error('Failed to get `isPaused`: {}'.format(e))
-        onError(e)
-        return False
+    if host[2] is not None and _deviceHostsByUuid.get(str(host[2])) is host:
+        del _deviceHostsByUuid[str(host[2])]
 
 
-def isSpotifyUri(uri):
-    return uri.startswith('spotify:')
+def _isCachedDeviceHost(host):
+    with _deviceHostsLock:
+        return _deviceHostsByServiceName.get(
+            CACHED_DEVICE_HOST_KEY_PREFIX + host[4]) is host
 
 
-def isSpotifyPlaylistUri(uri):
-    return isSpotifyUri(uri) and uri.startswith('spotify:playlist:')
+def _waitForDeviceHost(deviceNameOrUuid, timeout):
+    '''
+    Waits for the device browser to (re)discover a device
 
+    :param deviceNameOrUuid: str Friendly name or UUID of the device
+    :param timeout: float Max seconds to wait
 
-def isSpotifyTrackUri(uri):
-    return isSpotifyUri(uri) and uri.startswith('spotify:track:')
+    Returns: tuple|None Live device host, if found in time
+    '''
 
+    def findLiveHost():
+        host = _deviceHostsByName.get(deviceNameOrUuid) or \
+            _deviceHostsByUuid.get(str(deviceNameOrUuid))
 
-def _getSpotifyAvailableDevices(calledFromSelf=False):
-    if not _spotifyClient:
-        raise Exception('Spotify client is not set up')
+        if host is None or _deviceHostsByServiceName.get(
+                CACHED_DEVICE_HOST_KEY_PREFIX + host[4]) is host:
+            return None
+
+        return host
+
+    with _deviceHostsChanged:
+        return _deviceHostsChanged.wait_for(findLiveHost, timeout)
+
+
+def _loadDeviceHostsCache():
+    '''
+    Seeds the device host registry with hosts from earlier runs
+
+    Returns: int Number of cached device hosts loaded
+    '''
+
+    try:
+        with open(DEVICE_HOSTS_CACHE_PATH) as f:
+            entries = json.load(f).get('hosts', [])
+    except FileNotFoundError:
+        logger.debug('No device hosts cache found')
+        return 0
+    except (OSError, ValueError, AttributeError):
+        logger.exception('Error: Failed to read device hosts cache')
+        return 0
+
+    now = time()
+    loadedCount = 0
+
+    for entry in entries:
+        try:
+            if now - entry['lastSeen'] > DEVICE_HOSTS_CACHE_MAX_AGE:
+                continue
+
+            host = (
+                entry['host'],
+                entry['port'],
+                UUID(entry['uuid']) if entry.get('uuid') else None,
+                entry.get('modelName'),
+                entry['friendlyName'],
+            )
+        except (KeyError, TypeError, ValueError):
+            logger.warning(
+                'Ignoring malformed device hosts cache entry: {}'.format(
+                    entry
+                )
+            )
+            continue
+
+        with _deviceHostsLock:
+            _deviceHostsCache[host[4]] = entry
+            isKnown = host[4] in _deviceHostsByName
+
+        if not isKnown:
+            _addDeviceHost(CACHED_DEVICE_HOST_KEY_PREFIX + host[4], host)
+            loadedCount += 1
+
+    logger.debug('Loaded {} device host(s) from cache'.format(loadedCount))
+
+    return loadedCount
+
+
+def _cacheDeviceHost(host):
+    with _deviceHostsLock:
+        _deviceHostsCache[host[4]] = {
+            'host': host[0],
+            'port': host[1],
+            'uuid': str(host[2]) if host[2] is not None else None,
+            'modelName': host[3],
+            'friendlyName': host[4],
+            'lastSeen': time(),
+        }
+
+    _saveDeviceHostsCache()
+
+
+def _forgetCachedDeviceHost(host):
+    _removeDeviceHost(CACHED_DEVICE_HOST_KEY_PREFIX + host[4])
+
+    with _deviceHostsLock:
+        entry = _deviceHostsCache.get(host[4])
+
+        if entry is None or entry['host'] != host[0] or \
+                entry['port'] != host[1]:
+            return
+
+        del _deviceHostsCache[host[4]]
+
+    _saveDeviceHostsCache()
+
+
+def _saveDeviceHostsCache():
+    with _deviceHostsLock:
+        data = {'hosts': list(_deviceHostsCache.values())}
+
+    with _deviceHostsCacheWriteLock:
+        try:
+            writeFileAtomically(
+                DEVICE_HOSTS_CACHE_PATH,
+                json.dumps(data, indent=2)
+            )
+        except OSError:
+            logger.exception('Error: Failed to write device hosts cache')
+
+
+def _connectToDeviceHost(host):
+    device = pychromecast.Chromecast(host[0], host[1])
+
+    if device.device.friendly_name != host[4]:
+        # the address got handed to another device since we saw it
+        device.disconnect(blocking=False)
+
+        raise pychromecast.error.ChromecastConnectionError(
+            '{}:{} is "{}", not "{}"'.format(
+                host[0],
+                host[1],
+                device.device.friendly_name,
+                host[4]
+            )
+        )
+
+    return device
+
+
+def getDevice(deviceName, timeout=DEVICE_CONNECT_TIMEOUT):
+    '''
+    Returns a connected device, reusing a pooled connection when possible.
+    Pass the device to `releaseDevice` (or use `disconnectFromDevice` in
+    `stop`, `quit` and `setVolume`) when done with it.
+
+    :param deviceName: str Friendly name or UUID of the device
+    :param timeout: float Seconds to wait for a newly connected device to
+        get ready
+    '''
+
+    logger.debug('Getting device "{}"'.format(deviceName))
+
+    host = getDeviceHost(deviceName)
+
+    if host is not None:
+        # the pool goes by friendly name (see `releaseDevice`), whether the
+        # caller asked for the device by name or UUID
+        deviceName = host[4]
+
+    _waitForDeviceTeardown(deviceName)
+
+    device = _acquirePooledDevice(deviceName)
+    if device is not None:
+        logger.debug('Reusing connection to "{}"'.format(deviceName))
+        return device
+
+    if host is None:
+        # the device browser picks the device up as soon as it announces
+        # itself - don't hold the caller up waiting for that
+        logger.warning(
+            'Device "{}" not found among {} known device(s)'.format(
+                deviceName,
+                len(getDeviceHosts())
+            )
+        )
+
+        raise DeviceNotFoundError(
+            'Device "{}" not found'.format(deviceName)
+        )
+
+    try:
+        device = _connectToDeviceHost(host)
+    except pychromecast.error.ChromecastConnectionError as e:
+        if not _isCachedDeviceHost(host):
+            raise
+
+        logger.warning(
+            'Cached host of "{}" failed ({}) - waiting for device '
+            'browser to find it'.format(deviceName, e)
+        )
+
+        _forgetCachedDeviceHost(host)
+
+        host = _waitForDeviceHost(deviceName, DEVICE_HOST_SCAN_TIMEOUT)
+
+        if host is None:
+            raise DeviceNotFoundError(
+                'Device "{}" not found'.format(deviceName)
+            )
+
+        device = _connectToDeviceHost(host)
+
+    # start worker thread and wait for cast device to be ready
+    logger.debug('Device "{}" found, connecting...'.format(deviceName))
+
+    device.wait(timeout)
+
+    if not device.status_event.is_set():
+        device.disconnect(blocking=False)
+
+        raise pychromecast.error.ChromecastConnectionError(
+            'Device "{}" didn\'t get ready within {:.3f} seconds'.format(
+                deviceName,
+                timeout
+            )
+        )
+
+    logger.debug('Connected to "{}"'.format(deviceName))
+
+    return _addPooledDevice(deviceName, device)
+
+
+def releaseDevice(device):
+    '''
+    Hands a device from `getDevice` back to the pool, keeping its connection
+    warm for the next `getDevice` call. Devices not in the pool get
+    disconnected.
+    '''
+
+    if not device:
+        return
+
+    with _devicePoolLock:
+        entry = _devicePool.get(device.name)
+
+        if entry is not None and entry['device'] is device:
+            entry['users'] = max(entry['users'] - 1, 0)
+            entry['lastUsed'] = time()
+            return
+
+    device.disconnect(blocking=False)
+
+
+def closeDevicePool():
+    '''
+    Disconnects all pooled devices. Devices got afterwards don't get pooled.
+    '''
+
+    global _devicePoolHealthCheckTimer, _isDevicePoolClosed
+
+    with _devicePoolLock:
+        _isDevicePoolClosed = True
+
+        if _devicePoolHealthCheckTimer is not None:
+            _devicePoolHealthCheckTimer.cancel()
+            _devicePoolHealthCheckTimer = None
+
+        entries = list(_devicePool.values())
+        _devicePool.clear()
+
+    for entry in entries:
+        _disconnectPooledDevice(entry['device'])
+
+
+def _isDeviceConnected(device):
+    return device.socket_client.is_alive() and \
+        device.socket_client.is_connected
+
+
+def _acquirePooledDevice(deviceName):
+    with _devicePoolLock:
+        entry = _devicePool.get(deviceName)
+
+        if entry is None:
+            return None
+
+        if _isDeviceConnected(entry['device']):
+            entry['users'] += 1
+            entry['lastUsed'] = time()
+
+            return entry['device']
+
+        del _devicePool[deviceName]
+
+    logger.info(
+        'Pooled connection to "{}" was lost - reconnecting'.format(deviceName)
+    )
+
+    _disconnectPooledDevice(entry['device'])
+
+    return None
+
+
+def _addPooledDevice(deviceName, device):
+    with _devicePoolLock:
+        if _isDevicePoolClosed:
+            # `releaseDevice` disconnects it
+            return device
+
+        entry = _devicePool.get(deviceName)
+
+        if entry is not None and _isDeviceConnected(entry['device']):
+            # another thread connected to the same device meanwhile
+            entry['users'] += 1
+            entry['lastUsed'] = time()
+            pooledDevice = entry['device']
+        else:
+            _devicePool[deviceName] = {
+                'device': device,
+                'users': 1,
+                'lastUsed': time(),
+            }
+            pooledDevice = device
+
+            _trackDeviceState(device)
+
+        if _devicePoolHealthCheckTimer is None:
+            _scheduleDevicePoolHealthCheck()
+
+    if pooledDevice is not device:
+        device.disconnect(blocking=False)
+
+    return pooledDevice
+
+
+def _disconnectPooledDevice(device):
+    _devicePlayerStatusListeners.pop(device, None)
+
+    # no more updates would make it in - don't let it go stale unnoticed
+    with _deviceStatesLock:
+        _deviceStates.pop(device.name, None)
+
+    try:
+        device.disconnect(blocking=False)
+    except Exception:
+        logger.exception(
+            'Error: Failed to disconnect from "{}"'.format(device.name)
+        )
+
+
+def _scheduleDevicePoolHealthCheck():
+    global _devicePoolHealthCheckTimer
+
+    _devicePoolHealthCheckTimer = threading.Timer(
+        DEVICE_POOL_HEALTH_CHECK_INTERVAL,
+        _checkDevicePool
+    )
+    _devicePoolHealthCheckTimer.daemon = True
+    _devicePoolHealthCheckTimer.start()
+
+
+def _checkDevicePool():
+    '''
+    Disconnects devices that have been idle for too long and reconnects
+    devices whose connection was lost, so that `getDevice` stays instant
+    '''
+
+    idleDevices = []
+    lostDeviceNames = []
+
+    with _devicePoolLock:
+        if _isDevicePoolClosed:
+            return
+
+        for deviceName, entry in list(_devicePool.items()):
+            if not _isDeviceConnected(entry['device']):
+                del _devicePool[deviceName]
+                idleDevices.append(entry['device'])
+                lostDeviceNames.append(deviceName)
+            elif entry['users'] == 0 and \
+                    time() - entry['lastUsed'] > DEVICE_POOL_IDLE_TIMEOUT:
+                del _devicePool[deviceName]
+                idleDevices.append(entry['device'])
+
+        _scheduleDevicePoolHealthCheck()
+
+    for device in idleDevices:
+        logger.debug('Removing "{}" from device pool'.format(device.name))
+        _disconnectPooledDevice(device)
+
+    for deviceName in lostDeviceNames:
+        logger.info(
+            'Pooled connection to "{}" was lost - reconnecting'.format(
+                deviceName
+            )
+        )
+
+        try:
+            releaseDevice(getDevice(deviceName))
+        except Exception:
+            logger.exception(
+                'Error: Failed to reconnect to "{}"'.format(deviceName)
+            )
+
+
+def stop(device, disconnectFromDevice=False):
+    if not device:
+        return
+
+    logger.info('Stopping playback on "{}"'.format(device.name))
+
+    try:
+        _pauseSpotify(device)
+    except (Exception, SpotifyPlaybackError):
+        logger.exception('Failed to pause Spotify playback')
+
+    try:
+        device.media_controller.stop()
+    except pychromecast.error.ControllerNotRegistered as e:
+        logger.error('Failed to stop: {}'.format(e))
+        onError(e)
+        return
+
+    if disconnectFromDevice:
+        logger.info(
+            'Playback stopped on "{}" - disconnecting..'.format(device.name)
+        )
+        releaseDevice(device)
+
+
+def quit(device, disconnectFromDevice=False):
+    if not device:
+        return
+
+    logger.info('Closing Chromecast application on "{}"'.format(device.name))
+
+    try:
+        if device.app_id:
+            device.quit_app()
+        else:
+            logger.info(
+                ' - no Chromecast application active '
+                'on "{}"!'.format(device.name)
+            )
+    except pychromecast.error.ControllerNotRegistered as e:
+        logger.error('Failed to quit: {}'.format(e))
+        onError(e)
+        return
+
+    if disconnectFromDevice:
+        logger.info('Disconnecting from "{}"'.format(device.name))
+        releaseDevice(device)
+
+
+def stopAndQuit(device, teardownDeadline=STOP_TEARDOWN_DEADLINE):
+    '''
+    Silences the device right away and leaves the rest - pausing Spotify,
+    closing the Chromecast application and releasing the device - to a
+    background thread, bounded by `teardownDeadline` (in seconds)
+
+    Returns: threading.Thread|None The teardown thread, to join when the
+        teardown has to be done before going on
+    '''
+
+    if not device:
+        return None
+
+    startedAt = monotonic()
+    phaseLatencies = {}
+    state = getDeviceState(device.name)
+    # going by the state shadow - no time for asking Spotify
+    isActive = state is not None and (state.isPlaying or state.isPaused)
+
+    logger.info('Stopping playback on "{}"'.format(device.name))
+
+    try:
+        if device.media_controller.status.media_session_id is not None:
+            device.media_controller.stop()
+        elif device.app_id:
+            # no media session to stop - closing the application silences it
+            device.quit_app()
+    except pychromecast.error.ControllerNotRegistered as e:
+        logger.error('Failed to stop: {}'.format(e))
+        onError(e)
+
+    phaseLatencies['audible'] = monotonic() - startedAt
+
+    def tearDown():
+        global _lastStopLatencies
+
+        deadline = startedAt + teardownDeadline
+
+        try:
+            if isActive and _spotifyClient:
+                phaseStartedAt = monotonic()
+
+                try:
+                    with latencyBudget(deadline - phaseStartedAt):
+                        _pauseSpotify(device)
+                except Exception:
+                    logger.exception('Error: Failed to pause Spotify playback')
+
+                phaseLatencies['spotifyPause'] = monotonic() - phaseStartedAt
+
+            phaseStartedAt = monotonic()
+
+            quit(device, disconnectFromDevice=True)
+
+            phaseLatencies['quit'] = monotonic() - phaseStartedAt
+            phaseLatencies['total'] = monotonic() - startedAt
+
+            with _deviceTeardownsLock:
+                _lastStopLatencies = dict(phaseLatencies)
+
+            logger.info('Stopped "{}" - phase latencies: {}'.format(
+                device.name,
+                ', '.join(
+                    '{} {:.3f}s'.format(name, latency)
+                    for name, latency in phaseLatencies.items()
+                )
+            ))
+
+            if phaseLatencies['total'] > teardownDeadline:
+                logger.warning(
+                    'Stopping "{}" took {:.3f} seconds - over the {} second '
+                    'deadline'.format(
+                        device.name,
+                        phaseLatencies['total'],
+                        teardownDeadline
+                    )
+                )
+        finally:
+            with _deviceTeardownsLock:
+                for key in (device.name, str(device.uuid)):
+                    if _deviceTeardowns.get(key) is teardown:
+                        del _deviceTeardowns[key]
+
+    teardown = threading.Thread(
+        target=tearDown,
+        name='teardown:{}'.format(device.name)
+    )
+    teardown.daemon = True
+
+    with _deviceTeardownsLock:
+        _deviceTeardowns[device.name] = teardown
+        _deviceTeardowns[str(device.uuid)] = teardown
+
+    teardown.start()
+
+    return teardown
+
+
+def getLastStopLatencies():
+    '''
+    Returns: dict|None Latencies (in seconds) of the phases of the last
+        `stopAndQuit` - `audible`, `spotifyPause` (if Spotify was paused),
+        `quit` and `total`
+    '''
+
+    with _deviceTeardownsLock:
+        return dict(_lastStopLatencies) if _lastStopLatencies else None
+
+
+def _waitForDeviceTeardown(deviceName):
+    # don't hand out a device still being torn down - its pending quit
+    # would close whatever the caller starts on it
+    with _deviceTeardownsLock:
+        teardown = _deviceTeardowns.get(deviceName)
+
+    if teardown is None or teardown is threading.current_thread():
+        return
+
+    logger.debug('Waiting for "{}" to get torn down'.format(deviceName))
+
+    teardown.join(STOP_TEARDOWN_DEADLINE)
+
+
+def setVolume(device, volume, callback=None, disconnectFromDevice=False):
+    if not device:
+        return
+
+    logger.info(
+        'Setting volume to {}% on "{}"'.format(
+            volume * 100,
+            device.name
+        )
+    )
+
+    try:
+        device.set_volume(volume)
+    except pychromecast.error.ControllerNotRegistered as e:
+        logger.error('Failed to set volume: {}'.format(e))
+        onError(e)
+        return
+
+    if callback is not None:
+        logger.info(
+            'Volume set on "{}" - disconnecting...'.format(device.name)
+        )
+        releaseDevice(device)
+
+    if disconnectFromDevice:
+        logger.info(
+            'Volume set on "{}" - disconnecting...'.format(device.name)
+        )
+        releaseDevice(device)
+
+
+def parseVolumePresets(presets):
+    '''
+    Parses volume presets like "Kitchen=0.3,Living Room=0.5"
+
+    :param presets: str
+    Returns: list (str, float) tuples of device name and volume
+    Raises: ValueError for malformed presets
+    '''
+
+    parsedPresets = []
+
+    for preset in presets.split(','):
+        if not preset.strip():
+            continue
+
+        deviceName, separator, volume = preset.partition('=')
+        deviceName = deviceName.strip()
+
+        try:
+            volume = float(volume)
+        except ValueError:
+            volume = None
+
+        if not separator or not deviceName or volume is None or \
+                not 0 <= volume <= 1:
+            raise ValueError('Malformed volume preset "{}"'.format(
+                preset.strip()
+            ))
+
+        parsedPresets.append((deviceName, volume))
+
+    return parsedPresets
+
+
+def applyVolumePresets(presets, timeout=VOLUME_PRESETS_TIMEOUT):
+    '''
+    Sets the volumes of all devices in `presets` concurrently, reusing their
+    pooled connections. A device failing doesn't keep the others from
+    getting their volume set.
+
+    :param presets: list See `parseVolumePresets`
+    :param timeout: float Seconds to wait for all devices
+    Returns: dict Seconds it took per device name - `None` for devices that
+        failed or didn't make it within `timeout`
+    '''
+
+    def applyVolumePreset(deviceName, volume):
+        startedAt = monotonic()
+        device = getDevice(deviceName, timeout=max(deadline - startedAt, 0))
+
+        try:
+            setVolume(device, volume)
+        finally:
+            releaseDevice(device)
+
+        return monotonic() - startedAt
+
+    startedAt = monotonic()
+    deadline = startedAt + timeout
+    futures = {
+        _submitDeviceTask(applyVolumePreset, deviceName, volume): deviceName
+        for deviceName, volume in presets
+    }
+    _, pendingFutures = concurrent.futures.wait(futures, timeout)
+    latencies = {}
+
+    for future, deviceName in futures.items():
+        latencies[deviceName] = None
+
+        if future in pendingFutures:
+            logger.warning(
+                'Setting volume on "{}" took longer than {} seconds'.format(
+                    deviceName,
+                    timeout
+                )
+            )
+            continue
+
+        try:
+            latencies[deviceName] = future.result()
+        except (DeviceNotFoundError,
+                pychromecast.error.ChromecastConnectionError) as e:
+            logger.warning('Failed to set volume: {}'.format(e))
+        except Exception:
+            logger.exception(
+                'Error: Failed to set volume on "{}"'.format(deviceName)
+            )
+
+    logger.info('Applied volume presets in {:.3f} seconds - {}'.format(
+        monotonic() - startedAt,
+        ', '.join(
+            '"{}" {}'.format(
+                deviceName,
+                'failed' if latency is None else '{:.3f}s'.format(latency)
+            ) for deviceName, latency in latencies.items()
+        )
+    ))
+
+    return latencies
+
+
+def _submitDeviceTask(task, *args):
+    '''
+    Runs `task` on a daemon thread of its own, so that a device not
+    responding neither holds up other devices' tasks nor keeps the process
+    from exiting
+
+    Returns: concurrent.futures.Future
+    '''
+
+    future = concurrent.futures.Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+
+        try:
+            result = task(*args)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+    thread = threading.Thread(target=run, name='deviceTask')
+    thread.daemon = True
+    thread.start()
+
+    return future
+
+
+def isPlaying(device, maxSpotifyStateAge=None):
+    '''
+    Tells from the device's state shadow whether something is playing on
+    it. Only does I/O when given `maxSpotifyStateAge` and the shadow's
+    Spotify playback state is older than that.
+
+    :param maxSpotifyStateAge: float|None Max age (in seconds) of the
+        Spotify playback state to go by - fetches it anew if older
+    '''
+
+    if not device:
+        return False
+
+    state = getDeviceState(device.name)
+
+    if maxSpotifyStateAge is not None and (
+            state is None or state.spotifyStateUpdatedAt is None or
+            time() - state.spotifyStateUpdatedAt > maxSpotifyStateAge):
+        isSpotifyPlaying(device, maxStateAge=maxSpotifyStateAge)
+        state = getDeviceState(device.name)
+
+    return state is not None and state.isPlaying
+
+
+def isSpotifyPlaying(device, maxStateAge=None):
+    '''
+    :param maxStateAge: float|None Max age (in seconds) of a cached Spotify
+        playback state to go by - fetches it anew if older. Defaults to
+        `SPOTIFY_PLAYBACK_STATE_CACHE_TTL`.
+    '''
+
+    if not device:
+        return False
+
+    if not _spotifyClient:
+        return False
+
+    requestedAt = time()
 
     try:
-        devices = _spotifyClient.devices().get('devices', [])
+        fetchedAt, playbackStatus = _spotifyStateCache.get(
+            'playback',
+            _fetchSpotifyPlaybackStatus,
+            SPOTIFY_PLAYBACK_STATE_CACHE_TTL
+        )
+
+        if maxStateAge is not None and \
+                fetchedAt < requestedAt - maxStateAge:
+            _spotifyStateCache.invalidate('playback')
+
+            fetchedAt, playbackStatus = _spotifyStateCache.get(
+                'playback',
+                _fetchSpotifyPlaybackStatus,
+                SPOTIFY_PLAYBACK_STATE_CACHE_TTL
+            )
+    except spotipy.client.SpotifyException:
+        logger.exception(
+            'Error: Failed to get current Spotify playback status'
+            ' - got Spotify error'
+        )
+        return False
+
+    _updateSpotifyDeviceStates(
+        (playbackStatus.get('device') or {}).get('name')
+        if playbackStatus and playbackStatus.get('is_playing') else None,
+        updatedAt=fetchedAt
+    )
+
+    if not playbackStatus:
+        return False
+
+    if playbackStatus.get('is_playing') and \
+            playbackStatus.get('device', {}).get('name') != device.name:
+        logger.warning(
+            'isSpotifyPlaying: Spotify playback status indicates '
+            'a device ({}) currently playing but with different '
+            'device name from the one specified ({}) - considering '
+            'playback status as "not playing"'.format(
+                playbackStatus.get('device', {}).get('name'),
+                device.name
+            )
+        )
+        return False
+
+    return playbackStatus.get('is_playing', False)
+
+
+def _fetchSpotifyPlaybackStatus():
+    '''
+    Returns: tuple `(fetchedAt, playbackStatus)` - `fetchedAt` being when
+        the request was made, to tell the age of a cached playback status
+    '''
+
+    fetchedAt = time()
+
+    return fetchedAt, _spotifyClient.current_playback()
+
+
+def isPaused(device):
+    '''
+    Tells from the device's state shadow, without any I/O, whether playback
+    is paused on it
+    '''
+
+    if not device:
+        return False
+
+    state = getDeviceState(device.name)
+
+    return state is not None and state.isPaused
+
+
+def getMediaStatusPipelineStats():
+    '''
+    Returns: dict Counts of media status updates `submitted`, `merged` into
+        a later one, `dropped` and `handled`
+    '''
+
+    return _mediaStatusWorker.stats
+
+
+def getDeviceState(deviceName):
+    '''
+    Returns: DeviceState|None Latest state of a connected device
+    '''
+
+    return _deviceStates.get(deviceName)
+
+
+def getDeviceStates():
+    '''
+    Returns: dict Latest `DeviceState` of every connected device, by name
+    '''
+
+    with _deviceStatesLock:
+        return dict(_deviceStates)
+
+
+def _trackDeviceState(device):
+    listener = DeviceStateListener(device.name)
+
+    with _deviceStatesLock:
+        _deviceStates[device.name] = DeviceState(
+            name=device.name,
+            appId=None,
+            volumeLevel=None,
+            playerState=None,
+            streamType=None,
+            contentId=None,
+            spotifyIsPlaying=None,
+            castStatusUpdatedAt=None,
+            mediaStatusUpdatedAt=None,
+            spotifyStateUpdatedAt=None
+        )
+
+    device.register_status_listener(listener)
+    device.media_controller.register_status_listener(listener)
+
+    # catch up with what came in before the listener got registered
+    listener.new_cast_status(device.status)
+    listener.new_media_status(device.media_controller.status)
+
+
+def _updateDeviceState(deviceName, **changes):
+    with _deviceStatesLock:
+        state = _deviceStates.get(deviceName)
+
+        if state is not None:
+            _deviceStates[deviceName] = state._replace(**changes)
+
+
+def _updateSpotifyDeviceStates(playingDeviceName, updatedAt=None):
+    '''
+    :param playingDeviceName: str|None Name of the device Spotify plays on
+    :param updatedAt: float|None When Spotify was asked (defaults to now) -
+        states updated since are left alone
+    '''
+
+    if updatedAt is None:
+        updatedAt = time()
+
+    # Spotify only ever plays on one device (per account)
+    with _deviceStatesLock:
+        for deviceName, state in _deviceStates.items():
+            if state.spotifyStateUpdatedAt is not None and \
+                    state.spotifyStateUpdatedAt > updatedAt:
+                continue
+
+            _deviceStates[deviceName] = state._replace(
+                spotifyIsPlaying=deviceName == playingDeviceName,
+                spotifyStateUpdatedAt=updatedAt
+            )
+
+
+def isSpotifyUri(uri):
+    return uri.startswith('spotify:')
+
+
+def isSpotifyPlaylistUri(uri):
+    return isSpotifyUri(uri) and uri.startswith('spotify:playlist:')
+
+
+def isSpotifyTrackUri(uri):
+    return isSpotifyUri(uri) and uri.startswith('spotify:track:')
+
+
+def _getSpotifyAvailableDevices(calledFromSelf=False):
+    if not _spotifyClient:
+        raise Exception('Spotify client is not set up')
+
+    try:
+        devices = _spotifyStateCache.get(
+            'devices',
+            lambda: _spotifyClient.devices().get('devices', []),
+            SPOTIFY_DEVICES_CACHE_TTL
+        )
     except spotipy.client.SpotifyException:
         if calledFromSelf:
             logger.exception(
@@ -393,96 +1651,442 @@ def _getSpotifyAvailableDevices(calledFromSelf=False):
                 '- trying once more'
             )
 
-            return _getSpotifyAvailableDevices(calledFromSelf=True)
-        else:
-            logger.warning(
-                'No available Spotify devices found after second attempt'
-            )
+            _spotifyStateCache.invalidate('devices')
+
+            return _getSpotifyAvailableDevices(calledFromSelf=True)
+        else:
+            logger.warning(
+                'No available Spotify devices found after second attempt'
+            )
+
+    return devices
+
+
+def _getSpotifyDeviceId(filters):
+    '''
+    :param filters: dict
+    '''
+
+    availableSpotifyDevices = _getSpotifyAvailableDevices()
+
+    logger.debug('Available Spotify devices: {}'.format(
+        availableSpotifyDevices))
+
+    filteredSpotifyDevices = []
+    for device in availableSpotifyDevices:
+        passedFilters = True
+        for key in filters.keys():
+            if not (key in device.keys()):
+                passedFilters = False
+                break
+
+            if device[key] != filters[key]:
+                passedFilters = False
+                break
+        if passedFilters:
+            filteredSpotifyDevices.append(device)
+
+    try:
+        deviceId = filteredSpotifyDevices[0]['id']
+    except IndexError:
+        deviceId = None
+    return deviceId, availableSpotifyDevices
+
+
+@contextmanager
+def latencyBudget(seconds):
+    '''
+    Bounds the total time Spotify Web API requests made on the calling
+    thread may take within the context, e.g. while handling a click.
+    Requests made once the budget is used up raise `SpotifyUnavailableError`.
+
+    :param seconds: float
+    '''
+
+    previousDeadline = getattr(_latencyBudgets, 'deadline', None)
+    deadline = monotonic() + seconds
+
+    if previousDeadline is not None:
+        deadline = min(deadline, previousDeadline)
+
+    _latencyBudgets.deadline = deadline
+
+    try:
+        yield
+    finally:
+        _latencyBudgets.deadline = previousDeadline
+
+
+def _getRemainingLatencyBudget():
+    deadline = getattr(_latencyBudgets, 'deadline', None)
+
+    if deadline is None:
+        return None
+
+    return deadline - monotonic()
+
+
+def getSpotifyStateCacheStats():
+    '''
+    Returns: dict Hit/miss counters of the Spotify playback state and
+        devices cache
+    '''
+
+    return _spotifyStateCache.stats
+
+
+def _setupSpotifyClient():
+    global _spotifyClient
+
+    logger.info('Setting up Spotify client...')
+
+    try:
+        oAuthClientId = os.environ['SPOTIFY_OAUTH_CLIENT_ID']
+        oAuthClientSecret = os.environ['SPOTIFY_OAUTH_CLIENT_SECRET']
+    except KeyError:
+        raise SpotifyOAuthCredentialsError(
+            'Missing Spotify OAuth app credentials in env vars '
+            '`SPOTIFY_OAUTH_CLIENT_ID` and/or `SPOTIFY_OAUTH_CLIENT_ID`')
+
+    requestsSession = SpotifyRequestsSession()
+
+    _spotifyClient = spotipy.Spotify(
+        auth_manager=spotipy.oauth2.SpotifyOAuth(
+            client_id=oAuthClientId,
+            client_secret=oAuthClientSecret,
+            scope=SPOTIFY_OAUTH_SCOPE,
+            redirect_uri='http://localhost:{}/redirect'.format(
+                SPOTIFY_OAUTH_REDIRECT_SERVER_PORT),
+            cache_handler=SpotifyTokensCacheHandler(
+                SPOTIFY_OAUTH_TOKENS_CACHE_PATH),
+            requests_session=requestsSession,
+            requests_timeout=SPOTIFY_REQUEST_TIMEOUT  # ,
+            # show_dialog=True
+        ),
+        requests_session=requestsSession,
+        requests_timeout=SPOTIFY_REQUEST_TIMEOUT
+    )
+
+    try:
+        _spotifyClient.auth_manager.get_access_token(as_dict=False)
+        logger.info('Spotify client successfully set up')
+    except Exception:
+        raise SpotifyOAuthCredentialsError(
+            'Failed to get initial Spotify access token')
+
+    _scheduleSpotifyOAuthTokenRefresh()
+
+    if logger.level == logging.DEBUG:
+        spotipy.trace = True
+        spotipy.trace_out = True
+
+    return _spotifyClient
+
+
+def getSpotifyOAuthTokenMetrics():
+    '''
+    Returns: dict `tokenAge` and `expiresIn` of the current Spotify OAuth
+        access token, along with `lastRefreshLatency` (all in seconds),
+        `refreshCount` and `refreshFailureCount` of the refreshes made
+        ahead of expiry
+    '''
+
+    with _spotifyOAuthTokenRefreshLock:
+        metrics = dict(_spotifyOAuthTokenRefreshStats)
+
+    tokenInfo = _spotifyClient.auth_manager.cache_handler.get_cached_token() \
+        if _spotifyClient else None
+
+    if tokenInfo:
+        now = time()
+        metrics['tokenAge'] = now - (
+            tokenInfo['expires_at'] - tokenInfo['expires_in'])
+        metrics['expiresIn'] = tokenInfo['expires_at'] - now
+    else:
+        metrics['tokenAge'] = None
+        metrics['expiresIn'] = None
+
+    return metrics
+
+
+def _scheduleSpotifyOAuthTokenRefresh(delay=None):
+    '''
+    Schedules refreshing the Spotify OAuth access token ahead of its expiry,
+    so that no Web API call made on a click has to wait for a refresh
+    '''
+
+    global _spotifyOAuthTokenRefreshTimer
+
+    if delay is None:
+        tokenInfo = _spotifyClient.auth_manager.cache_handler \
+            .get_cached_token()
+
+        delay = max(
+            tokenInfo['expires_at'] - time() -
+            SPOTIFY_OAUTH_TOKEN_REFRESH_MARGIN,
+            0
+        )
+
+    with _spotifyOAuthTokenRefreshLock:
+        if _spotifyOAuthTokenRefreshTimer is not None:
+            _spotifyOAuthTokenRefreshTimer.cancel()
+
+        _spotifyOAuthTokenRefreshTimer = threading.Timer(
+            delay,
+            _refreshSpotifyOAuthToken
+        )
+        _spotifyOAuthTokenRefreshTimer.daemon = True
+        _spotifyOAuthTokenRefreshTimer.start()
+
+    logger.debug(
+        'Scheduled Spotify OAuth token refresh in {:.0f} seconds'.format(
+            delay))
+
+
+def _refreshSpotifyOAuthToken():
+    global _spotifyOAuthTokenRefreshFailureStreak
+
+    authManager = _spotifyClient.auth_manager
+    tokenAge = getSpotifyOAuthTokenMetrics()['tokenAge']
+    startTime = monotonic()
+
+    try:
+        authManager.refresh_access_token(
+            authManager.cache_handler.get_cached_token()['refresh_token']
+        )
+    except Exception as e:
+        logger.exception('Error: Failed to refresh Spotify OAuth token')
+
+        with _spotifyOAuthTokenRefreshLock:
+            _spotifyOAuthTokenRefreshStats['refreshFailureCount'] += 1
+
+        if _isRejectedRequestError(e):
+            # e.g. `invalid_grant` for a revoked refresh token - leave it to
+            # spotipy to refresh (or fail) when the Web API gets called
+            logger.error(
+                'Spotify rejected the OAuth token refresh - not retrying '
+                'in the background')
+            return
+
+        with _spotifyOAuthTokenRefreshLock:
+            _spotifyOAuthTokenRefreshFailureStreak += 1
+            delay = min(
+                SPOTIFY_OAUTH_TOKEN_REFRESH_RETRY_INTERVAL *
+                2 ** (_spotifyOAuthTokenRefreshFailureStreak - 1),
+                SPOTIFY_OAUTH_TOKEN_REFRESH_MAX_RETRY_INTERVAL
+            )
+
+        _scheduleSpotifyOAuthTokenRefresh(delay=delay)
+        return
+
+    refreshLatency = monotonic() - startTime
+
+    with _spotifyOAuthTokenRefreshLock:
+        _spotifyOAuthTokenRefreshStats['lastRefreshLatency'] = refreshLatency
+        _spotifyOAuthTokenRefreshStats['refreshCount'] += 1
+        _spotifyOAuthTokenRefreshFailureStreak = 0
+
+    logger.info(
+        'Refreshed Spotify OAuth token in {:.3f} seconds '
+        '(replaced token was {:.0f} seconds old)'.format(
+            refreshLatency,
+            tokenAge
+        )
+    )
+
+    _scheduleSpotifyOAuthTokenRefresh()
+
+
+def _isRejectedRequestError(error):
+    '''
+    Tells whether `error`, or the error it was raised while handling, is an
+    HTTP 4xx response other than 429 - i.e. trying again won't help
+    '''
+
+    while error is not None:
+        if isinstance(error, requests.exceptions.HTTPError) and \
+                error.response is not None:
+            statusCode = error.response.status_code
+
+            return 400 <= statusCode < 500 and statusCode != 429
+
+        error = error.__cause__ or error.__context__
+
+    return False
+
+
+def _getSpotifyUserCredentials():
+    try:
+        return (
+            os.environ['SPOTIFY_USER_USERNAME'],
+            os.environ['SPOTIFY_USER_PASSWORD']
+        )
+    except KeyError:
+        raise SpotifyPlaybackError(
+            'Missing Spotify user credentials in env vars '
+            '`SPOTIFY_USER_USERNAME` and/or `SPOTIFY_USER_PASSWORD`')
+
+
+def _setupSpotifyControllerToken():
+    '''
+    Gets a Spotify Chromecast controller token - from the cache file, if it
+    has one valid for long enough - and keeps it refreshed in the background
+    '''
+
+    global _spotifyControllerToken
+
+    try:
+        with open(SPOTIFY_CONTROLLER_TOKEN_CACHE_PATH) as f:
+            token = json.load(f)
+
+        token = (token['accessToken'], int(token['expiresAt']))
+    except FileNotFoundError:
+        token = None
+    except (OSError, ValueError, KeyError, TypeError):
+        logger.exception(
+            'Error: Failed to read Spotify controller token cache')
+        token = None
+
+    if token is not None and _isSpotifyControllerTokenFresh(token):
+        logger.debug('Using cached Spotify controller token')
 
-    return devices
+        with _spotifyControllerTokenLock:
+            _spotifyControllerToken = token
 
+        _scheduleSpotifyControllerTokenRefresh(token)
+        return
 
-def _getSpotifyDeviceId(filters):
+    try:
+        _refreshSpotifyControllerToken()
+    except SpotifyPlaybackError:
+        # no Spotify user credentials - already logged
+        pass
+
+
+def _isSpotifyControllerTokenFresh(token):
+    return token[1] - time() > SPOTIFY_CONTROLLER_TOKEN_REFRESH_MARGIN
+
+
+def _refreshSpotifyControllerToken():
     '''
-    :param filters: dict
+    Logs in to get a new Spotify Chromecast controller token, caches it and
+    schedules the next refresh
+
+    Returns: tuple `(accessToken, expiresAt)`
     '''
 
-    availableSpotifyDevices = _getSpotifyAvailableDevices()
+    global _spotifyControllerToken, _spotifyControllerTokenFailureStreak
 
-    logger.debug('Available Spotify devices: {}'.format(
-        availableSpotifyDevices))
+    try:
+        spotifyUserUsername, spotifyUserPassword = \
+            _getSpotifyUserCredentials()
+    except SpotifyPlaybackError as e:
+        logger.warning(
+            'Not refreshing Spotify controller token: {}'.format(e))
+        raise
 
-    filteredSpotifyDevices = []
-    for device in availableSpotifyDevices:
-        passedFilters = True
-        for key in filters.keys():
-            if not (key in device.keys()):
-                passedFilters = False
-                break
+    logger.debug('Refreshing Spotify controller token...')
 
-            if device[key] != filters[key]:
-                passedFilters = False
-                break
-        if passedFilters:
-            filteredSpotifyDevices.append(device)
+    startTime = time()
 
     try:
-        deviceId = filteredSpotifyDevices[0]['id']
-    except IndexError:
-        deviceId = None
-    return deviceId, availableSpotifyDevices
+        token = spotify_token.start_session(
+            spotifyUserUsername, spotifyUserPassword)
+        token = (token[0], int(token[1]))
+    except Exception as e:
+        logger.exception('Error: Failed to refresh Spotify controller token')
+
+        if _isRejectedRequestError(e):
+            # logging in again with the same credentials would only risk
+            # getting the account locked - wait for a Spotify URI to get
+            # played
+            logger.error(
+                'Spotify rejected the login - not retrying to refresh the '
+                'Spotify controller token in the background')
+            raise
+
+        with _spotifyControllerTokenLock:
+            _spotifyControllerTokenFailureStreak += 1
+            delay = min(
+                SPOTIFY_CONTROLLER_TOKEN_RETRY_INTERVAL *
+                2 ** (_spotifyControllerTokenFailureStreak - 1),
+                SPOTIFY_CONTROLLER_TOKEN_MAX_RETRY_INTERVAL
+            )
 
+        _scheduleSpotifyControllerTokenRefresh(None, delay=delay)
+        raise
 
-def _setupSpotifyClient():
-    global _spotifyClient
+    logger.info(
+        'Refreshed Spotify controller token in {:.3f} seconds'.format(
+            time() - startTime
+        )
+    )
 
-    logger.info('Setting up Spotify client...')
+    with _spotifyControllerTokenLock:
+        _spotifyControllerToken = token
+        _spotifyControllerTokenFailureStreak = 0
 
     try:
-        oAuthClientId = os.environ['SPOTIFY_OAUTH_CLIENT_ID']
-        oAuthClientSecret = os.environ['SPOTIFY_OAUTH_CLIENT_SECRET']
-    except KeyError:
-        raise SpotifyOAuthCredentialsError(
-            'Missing Spotify OAuth app credentials in env vars '
-            '`SPOTIFY_OAUTH_CLIENT_ID` and/or `SPOTIFY_OAUTH_CLIENT_ID`')
+        writeFileAtomically(
+            SPOTIFY_CONTROLLER_TOKEN_CACHE_PATH,
+            json.dumps({'accessToken': token[0], 'expiresAt': token[1]}),
+            mode=0o600
+        )
+    except OSError:
+        logger.exception(
+            'Error: Failed to write Spotify controller token cache')
 
-    _spotifyClient = spotipy.Spotify(
-        auth_manager=spotipy.oauth2.SpotifyOAuth(
-            client_id=oAuthClientId,
-            client_secret=oAuthClientSecret,
-            scope=SPOTIFY_OAUTH_SCOPE,
-            redirect_uri='http://localhost:{}/redirect'.format(
-                SPOTIFY_OAUTH_REDIRECT_SERVER_PORT),
-            cache_path=SPOTIFY_OAUTH_TOKENS_CACHE_PATH  # ,
-            # show_dialog=True
+    _scheduleSpotifyControllerTokenRefresh(token)
+
+    return token
+
+
+def _scheduleSpotifyControllerTokenRefresh(token, delay=None):
+    global _spotifyControllerTokenRefreshTimer
+
+    if delay is None:
+        delay = max(
+            token[1] - time() - SPOTIFY_CONTROLLER_TOKEN_REFRESH_MARGIN,
+            SPOTIFY_CONTROLLER_TOKEN_MIN_VALIDITY
         )
-    )
 
-    try:
-        _spotifyClient.auth_manager.get_access_token()
-        logger.info('Spotify client successfully set up')
-    except Exception:
-        raise SpotifyOAuthCredentialsError(
-            'Failed to get initial Spotify access token')
+    def refresh():
+        try:
+            _refreshSpotifyControllerToken()
+        except Exception:
+            # already logged, and retried if worth it
+            pass
 
-    if logger.level == logging.DEBUG:
-        spotipy.trace = True
-        spotipy.trace_out = True
+    with _spotifyControllerTokenLock:
+        if _spotifyControllerTokenRefreshTimer is not None:
+            _spotifyControllerTokenRefreshTimer.cancel()
 
-    return _spotifyClient
+        _spotifyControllerTokenRefreshTimer = threading.Timer(delay, refresh)
+        _spotifyControllerTokenRefreshTimer.daemon = True
+        _spotifyControllerTokenRefreshTimer.start()
 
 
-def _getSpotifyChromecastController():
+def _getSpotifyControllerToken():
+    with _spotifyControllerTokenLock:
+        token = _spotifyControllerToken
+
+    if token is not None and \
+            token[1] - time() > SPOTIFY_CONTROLLER_TOKEN_MIN_VALIDITY:
+        return token
+
+    # only when the background refresh has been failing
+    logger.warning('No valid Spotify controller token - logging in...')
+
     try:
-        spotifyUserUsername = os.environ['SPOTIFY_USER_USERNAME']
-        spotifyUserPassword = os.environ['SPOTIFY_USER_PASSWORD']
-    except KeyError:
+        return _refreshSpotifyControllerToken()
+    except Exception as e:
         raise SpotifyPlaybackError(
-            'Missing Spotify user credentials in env vars '
-            '`SPOTIFY_USER_USERNAME` and/or `SPOTIFY_USER_PASSWORD`')
+            'Failed to get Spotify controller token: {}'.format(e))
+
+
+def _getSpotifyChromecastController():
     (spotifyControllerAccessToken,
-        spotifyControllerExpiresAt) = spotify_token.start_session(
-            spotifyUserUsername, spotifyUserPassword)
+        spotifyControllerExpiresAt) = _getSpotifyControllerToken()
     spotifyControllerExpiresIn = spotifyControllerExpiresAt - int(time())
 
     return SpotifyController(
@@ -499,6 +2103,9 @@ def _playSpotifyUri(device=None, uri=None):
         controller = _getSpotifyChromecastController()
         device.register_handler(controller)
         controller.launch_app()
+
+        # launching registers the device with Spotify
+        _spotifyStateCache.invalidate('devices')
     except pychromecast.error.LaunchError as e:
         raise SpotifyPlaybackError(
             'Failed to launch Spotify controller: {}'.format(e)
@@ -514,6 +2121,31 @@ def _playSpotifyUri(device=None, uri=None):
             'Failed to launch Spotify controller due to credential error'
         )
 
+    # the Spotify app tells its Spotify Connect device ID when launched -
+    # no need to look it up among the available devices
+    spotifyDeviceId = controller.device
+    _learnSpotifyDeviceId(device, spotifyDeviceId)
+
+    try:
+        _startSpotifyPlayback(device, spotifyDeviceId, uri)
+    except spotipy.client.SpotifyException as e:
+        if e.http_status != 404:
+            logger.exception(
+                'Error: Failed to start Spotify playback'
+                ' - got Spotify error'
+            )
+
+            raise SpotifyPlaybackError('Could not start playback')
+
+        logger.warning(
+            'Spotify rejected device ID "{}" - looking it up among '
+            'available devices'.format(spotifyDeviceId)
+        )
+    else:
+        return
+    finally:
+        _spotifyStateCache.invalidate('playback', 'devices')
+
     spotifyDeviceId, availableSpotifyDevices = _getSpotifyDeviceId(
         filters={'id': controller.device})
 
@@ -531,36 +2163,8 @@ def _playSpotifyUri(device=None, uri=None):
             )
         )
 
-    # start playback
     try:
-        if isSpotifyPlaylistUri(uri):
-            # offset = {'position': 0}
-            # if isSpotifyPlaylistUri(uri) and randomizedPlaylistStart:
-            # playlistId = uri.split('spotify:playlist:', False)[0]
-            # playlistItemCount = len(_spotifyClient.user_playlist_tracks(
-            # playlist_id=playlistId)['items'])
-
-            # offset = {'position': randint(0, playlistItemCount-1)}
-
-            # # need to enable repeat to ensure items after
-            # # the offset position will get played
-            # _spotifyClient.repeat('context', device_id=spotifyDeviceId)
-
-            _spotifyClient.start_playback(
-                device_id=spotifyDeviceId,
-                context_uri=uri  # ,
-                # offset=offset
-            )
-        elif isSpotifyTrackUri(uri):
-            _spotifyClient.start_playback(
-                device_id=spotifyDeviceId,
-                uris=[uri]
-            )
-        else:
-            _spotifyClient.start_playback(
-                device_id=spotifyDeviceId,
-                context_uri=uri
-            )
+        _startSpotifyPlayback(device, spotifyDeviceId, uri)
     except spotipy.client.SpotifyException:
         logger.exception(
             'Error: Failed to start Spotify playback'
@@ -568,12 +2172,80 @@ def _playSpotifyUri(device=None, uri=None):
         )
 
         raise SpotifyPlaybackError('Could not start playback')
+    finally:
+        _spotifyStateCache.invalidate('playback', 'devices')
+
+
+def _startSpotifyPlayback(device, spotifyDeviceId, uri):
+    if isSpotifyPlaylistUri(uri):
+        # offset = {'position': 0}
+        # if isSpotifyPlaylistUri(uri) and randomizedPlaylistStart:
+        # playlistId = uri.split('spotify:playlist:', False)[0]
+        # playlistItemCount = len(_spotifyClient.user_playlist_tracks(
+        # playlist_id=playlistId)['items'])
+
+        # offset = {'position': randint(0, playlistItemCount-1)}
+
+        # # need to enable repeat to ensure items after
+        # # the offset position will get played
+        # _spotifyClient.repeat('context', device_id=spotifyDeviceId)
+
+        _spotifyClient.start_playback(
+            device_id=spotifyDeviceId,
+            context_uri=uri  # ,
+            # offset=offset
+        )
+    elif isSpotifyTrackUri(uri):
+        _spotifyClient.start_playback(
+            device_id=spotifyDeviceId,
+            uris=[uri]
+        )
+    else:
+        _spotifyClient.start_playback(
+            device_id=spotifyDeviceId,
+            context_uri=uri
+        )
+
+    _updateSpotifyDeviceStates(device.name)
 
 
-def _pauseSpotify():
+def _pauseSpotify(device=None):
     if not _spotifyClient:
         raise Exception('Spotify client is not set up')
 
+    spotifyDeviceId = _getLearnedSpotifyDeviceId(device)
+
+    if spotifyDeviceId is not None:
+        try:
+            _spotifyClient.pause_playback(device_id=spotifyDeviceId)
+            _updateSpotifyDeviceStates(None)
+            return
+        except spotipy.client.SpotifyException as e:
+            if e.http_status == 403:
+                logger.debug(
+                    'Spotify refused to pause "{}" - not playing'.format(
+                        device.name
+                    )
+                )
+                # e.g. the playlist ended - nothing told the state shadow
+                _updateSpotifyDeviceStates(None)
+                return
+            elif e.http_status != 404:
+                logger.exception(
+                    'Error: Failed to pause Spotify playback'
+                    ' - got Spotify error'
+                )
+                return
+
+            logger.warning(
+                'Spotify rejected device ID "{}" - looking up the active '
+                'device'.format(spotifyDeviceId)
+            )
+
+            _forgetSpotifyDeviceId(device)
+        finally:
+            _spotifyStateCache.invalidate('playback', 'devices')
+
     spotifyDeviceId, availableSpotifyDevices = _getSpotifyDeviceId(
         filters={'is_active': True})
 
@@ -582,21 +2254,230 @@ def _pauseSpotify():
             'Can\'t pause Spotify playback - '
             'Spotify returned no active devices'
         )
+        _updateSpotifyDeviceStates(None)
         return
 
+    if device is not None and any(
+            i['id'] == spotifyDeviceId and i.get('name') == device.name
+            for i in availableSpotifyDevices):
+        _learnSpotifyDeviceId(device, spotifyDeviceId)
+
     try:
         _spotifyClient.pause_playback(device_id=spotifyDeviceId)
+        _updateSpotifyDeviceStates(None)
     except spotipy.client.SpotifyException:
         logger.exception(
             'Error: Failed to pause Spotify playback'
             ' - got Spotify error'
         )
+    finally:
+        _spotifyStateCache.invalidate('playback', 'devices')
+
+
+def _loadSpotifyDeviceIds():
+    global _hasLoadedSpotifyDeviceIds
+
+    # called with `_spotifyDeviceIdsLock` held
+    if _hasLoadedSpotifyDeviceIds:
+        return
+
+    _hasLoadedSpotifyDeviceIds = True
+
+    try:
+        with open(SPOTIFY_DEVICE_IDS_CACHE_PATH) as f:
+            data = json.load(f)
+
+        _spotifyDeviceIdsByName.update(data.get('byName', {}))
+        _spotifyDeviceIdsByUuid.update(data.get('byUuid', {}))
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, AttributeError, TypeError):
+        logger.exception('Error: Failed to read Spotify device IDs cache')
+
+
+def _saveSpotifyDeviceIds():
+    # called with `_spotifyDeviceIdsLock` held
+    try:
+        writeFileAtomically(
+            SPOTIFY_DEVICE_IDS_CACHE_PATH,
+            json.dumps({
+                'byName': _spotifyDeviceIdsByName,
+                'byUuid': _spotifyDeviceIdsByUuid,
+            }, indent=2)
+        )
+    except OSError:
+        logger.exception('Error: Failed to write Spotify device IDs cache')
+
+
+def _getLearnedSpotifyDeviceId(device):
+    '''
+    Returns: str|None Spotify Connect device ID last seen for the device
+    '''
+
+    if device is None:
+        return None
+
+    with _spotifyDeviceIdsLock:
+        _loadSpotifyDeviceIds()
+
+        return _getLearnedSpotifyDeviceIdLocked(device)
+
+
+def _getLearnedSpotifyDeviceIdLocked(device):
+    # the UUID survives the device getting renamed
+    if device.uuid is not None and \
+            str(device.uuid) in _spotifyDeviceIdsByUuid:
+        return _spotifyDeviceIdsByUuid[str(device.uuid)]
+
+    return _spotifyDeviceIdsByName.get(device.name)
+
+
+def _learnSpotifyDeviceId(device, spotifyDeviceId):
+    if device is None or not spotifyDeviceId:
+        return
+
+    with _spotifyDeviceIdsLock:
+        _loadSpotifyDeviceIds()
+
+        if _getLearnedSpotifyDeviceIdLocked(device) == spotifyDeviceId:
+            return
+
+        logger.debug('Learned Spotify device ID of "{}": {}'.format(
+            device.name, spotifyDeviceId))
+
+        _spotifyDeviceIdsByName[device.name] = spotifyDeviceId
+
+        if device.uuid is not None:
+            _spotifyDeviceIdsByUuid[str(device.uuid)] = spotifyDeviceId
+
+        _saveSpotifyDeviceIds()
+
+
+def _forgetSpotifyDeviceId(device):
+    with _spotifyDeviceIdsLock:
+        _loadSpotifyDeviceIds()
+
+        _spotifyDeviceIdsByName.pop(device.name, None)
+        _spotifyDeviceIdsByUuid.pop(str(device.uuid), None)
+
+        _saveSpotifyDeviceIds()
+
+
+def resolveMedia(uri):
+    '''
+    Follows the redirects of a media URI and tells its content type - the
+    `Content-Type` its server responds with, or else a guess from its
+    extension. Results are cached for `MEDIA_RESOLUTION_CACHE_TTL`.
+
+    :param uri: str
+    Returns: tuple `(resolvedUri, contentType)` - `contentType` is None
+        when it couldn't be told
+    '''
+
+    if not uri.startswith(('http://', 'https://')):
+        return uri, _guessContentType(uri)
+
+    try:
+        return _mediaResolutionCache.get(
+            uri,
+            functools.partial(_probeMedia, uri),
+            MEDIA_RESOLUTION_CACHE_TTL
+        )
+    except requests.exceptions.RequestException as e:
+        # not cached - try probing again next time
+        logger.warning(
+            'Failed to probe media uri "{}" ({}) - guessing its content '
+            'type from its extension'.format(uri, e)
+        )
+
+        return uri, _guessContentType(uri)
+
+
+def prefetchMedia(uris):
+    '''
+    Resolves media URIs ahead of playing them (see `resolveMedia`)
+
+    :param uris: list
+    '''
+
+    uris = [i for i in uris if not isSpotifyUri(i)]
+
+    for uri in uris:
+        resolvedUri, contentType = resolveMedia(uri)
+
+        logger.info('Media uri "{}" resolved to "{}" ({})'.format(
+            uri,
+            resolvedUri,
+            contentType
+        ))
+
+
+def _probeMedia(uri):
+    startTime = monotonic()
+
+    response = _mediaProbeSession.head(
+        uri,
+        allow_redirects=True,
+        timeout=MEDIA_PROBE_TIMEOUT
+    )
+    response.close()
+
+    if not response.ok or not _getResponseContentType(response):
+        # not every server - e.g. of radio streams - answers HEAD requests
+        # properly. Only the headers get read when streaming.
+        response = _mediaProbeSession.get(
+            uri,
+            headers={'Range': 'bytes=0-0'},
+            allow_redirects=True,
+            stream=True,
+            timeout=MEDIA_PROBE_TIMEOUT
+        )
+        response.close()
+
+    if response.ok:
+        resolvedUri = response.url
+        contentType = _getResponseContentType(response) or \
+            _guessContentType(resolvedUri) or _guessContentType(uri)
+    else:
+        logger.warning(
+            'Probing media uri "{}" got HTTP status {}'.format(
+                uri,
+                response.status_code
+            )
+        )
+
+        resolvedUri = uri
+        contentType = _guessContentType(uri)
+
+    logger.debug('Probed media uri "{}" in {:.3f} seconds'.format(
+        uri,
+        monotonic() - startTime
+    ))
+
+    return resolvedUri, contentType
+
+
+def _getResponseContentType(response):
+    contentType = response.headers.get('Content-Type', '') \
+        .split(';')[0].strip().lower()
+
+    # tells nothing the device could make use of
+    if contentType in ('', 'application/octet-stream', 'binary/octet-stream'):
+        return None
 
+    return contentType
 
-def play(data, device=None):
+
+def _guessContentType(uri):
+    return _mimeTypes.guess_type(uri)[0]
+
+
+def play(data, device=None, timeout=None):
     '''
     :param data: dict
     :param device
+    :param timeout: float|None Seconds to wait for the media session to get
+        active - forever if None
     '''
 
     if data is None:
@@ -609,16 +2490,11 @@ def play(data, device=None):
     # set up media data structure
     mediaArgs = dict(data['media']['args'])
 
-    if not isSpotifyUri(data['media']['uri']):
-        try:
-            mimeType = MimeTypes().guess_type(data['media']['uri'])[0]
-            mediaArgs['content_type'] = mimeType
-        except IndexError:
-            raise Exception(
-                'Failed to look up mime type for media uri "{}"'.format(
-                    data['media']['uri']
-                )
-            )
+    mediaUri = data['media']['uri']
+
+    if not isSpotifyUri(mediaUri):
+        mediaUri, mediaArgs['content_type'] = resolveMedia(mediaUri)
+
         if not mediaArgs.get('content_type'):
             raise Exception(
                 'Failed to look up mime type for media uri "{}"'.format(
@@ -632,7 +2508,7 @@ def play(data, device=None):
 
     logger.info('Starting playback on "{}"'.format(device.name))
     logger.debug('Playing:\n  - uri: {}\n  - args: {}'.format(
-        data['media']['uri'], mediaArgs))
+        mediaUri, mediaArgs))
 
     mc = device.media_controller
 
@@ -642,13 +2518,158 @@ def play(data, device=None):
             uri=data['media']['uri']
         )
     else:
-        mc.play_media(data['media']['uri'], **mediaArgs)
+        mc.play_media(mediaUri, **mediaArgs)
 
-    mc.block_until_active()
+    mc.block_until_active(timeout)
 
     return device
 
 
+def playOnDevices(data, deviceNames,
+                  startDeadline=MULTI_DEVICE_START_DEADLINE):
+    '''
+    Starts the same media on several devices at once, e.g. a radio stream
+    throughout the house. A device failing doesn't keep the others from
+    starting, and devices starting after `startDeadline` (in seconds) get
+    stopped again rather than play out of sync. Spotify URIs only get
+    played on the first device.
+
+    :param data: dict See `play`
+    :param deviceNames: list Friendly names or UUIDs of the devices
+    Returns: list `DeviceStartResult` per device, in `deviceNames` order
+    '''
+
+    skippedDeviceNames = []
+
+    if isSpotifyUri(data['media']['uri']) and len(deviceNames) > 1:
+        logger.warning(
+            'Spotify plays on one device at a time - playing "{}" on "{}" '
+            'only'.format(data['media']['uri'], deviceNames[0])
+        )
+
+        skippedDeviceNames = deviceNames[1:]
+        deviceNames = deviceNames[:1]
+
+    startedAt = monotonic()
+    deadline = startedAt + startDeadline
+    remainingLatencyBudget = _getRemainingLatencyBudget()
+
+    if remainingLatencyBudget is not None:
+        deadline = min(deadline, startedAt + remainingLatencyBudget)
+
+    def start(deviceName):
+        device = getDevice(
+            deviceName,
+            timeout=max(deadline - monotonic(), 0)
+        )
+
+        try:
+            # the latency budget is per thread - carry the caller's over
+            with latencyBudget(deadline - monotonic()):
+                play(data, device, timeout=max(deadline - monotonic(), 0))
+        except Exception:
+            releaseDevice(device)
+            raise
+
+        if not device.media_controller.session_active_event.is_set():
+            # the media may still start - don't let it play out of sync
+            stopAndQuit(device)
+
+            raise TimeoutError(
+                'Playback didn\'t start within {:.3f} seconds'.format(
+                    deadline - startedAt
+                )
+            )
+
+        return device, monotonic()
+
+    def stopLateDevice(deviceName, future):
+        if future.cancelled() or future.exception() is not None:
+            return
+
+        device, _ = future.result()
+
+        logger.warning(
+            'Playback on "{}" started after the deadline - stopping '
+            'it'.format(deviceName)
+        )
+
+        stopAndQuit(device)
+
+    futures = [
+        (deviceName, _submitDeviceTask(start, deviceName))
+        for deviceName in deviceNames
+    ]
+    _, pendingFutures = concurrent.futures.wait(
+        [future for _, future in futures],
+        max(deadline - monotonic(), 0)
+    )
+    starts = []
+
+    for deviceName, future in futures:
+        if future in pendingFutures:
+            future.add_done_callback(
+                functools.partial(stopLateDevice, deviceName)
+            )
+            starts.append((deviceName, None, None, TimeoutError(
+                'Playback didn\'t start within {:.3f} seconds'.format(
+                    deadline - startedAt
+                )
+            )))
+            continue
+
+        try:
+            device, deviceStartedAt = future.result()
+        except Exception as e:
+            starts.append((deviceName, None, None, e))
+        else:
+            starts.append((deviceName, device, deviceStartedAt, None))
+
+    firstStartedAt = min(
+        (i[2] for i in starts if i[1] is not None),
+        default=None
+    )
+    results = [
+        DeviceStartResult(
+            deviceName=deviceName,
+            device=device,
+            startLatency=None if device is None
+            else deviceStartedAt - startedAt,
+            startSkew=None if device is None
+            else deviceStartedAt - firstStartedAt,
+            error=error,
+            skipped=False
+        ) for deviceName, device, deviceStartedAt, error in starts
+    ] + [
+        DeviceStartResult(
+            deviceName=deviceName,
+            device=None,
+            startLatency=None,
+            startSkew=None,
+            error=None,
+            skipped=True
+        ) for deviceName in skippedDeviceNames
+    ]
+
+    logger.info('Started playback on {} of {} device(s) - {}'.format(
+        sum(1 for i in results if i.hasStarted),
+        len(results),
+        ', '.join(
+            '"{}" {}'.format(
+                i.deviceName,
+                'skipped' if i.skipped
+                else 'failed ({})'.format(i.error) if not i.hasStarted
+                else 'after {:.3f}s (skew {:.3f}s)'.format(
+                    i.startLatency,
+                    i.startSkew
+                )
+            ) for i in results
+        )
+    ))
+
+    return results
+
+
 def addDeviceStatusListener(device, callback):
     device.media_controller.register_status_listener(
         DeviceStatusListener(device, callback)
@@ -656,6 +2677,16 @@ def addDeviceStatusListener(device, callback):
 
 
 def addDevicePlayerStatusListener(device, callback):
-    device.media_controller.register_status_listener(
-        DeviceMediaStatusListener(device, callback)
-    )
+    listener = _devicePlayerStatusListeners.get(device)
+
+    if listener is not None:
+        # pooled devices are reused across playbacks - replace the callback
+        # rather than piling up listeners on the device
+        listener.callback = callback
+        listener.lastPlayerState = None
+        return
+
+    listener = DeviceMediaStatusListener(device, callback)
+    _devicePlayerStatusListeners[device] = listener
+
+    device.media_controller.register_status_listener(listener)
@@ -14,14 +14,21 @@ Bd addr are represented as standard python strings, e.g. "aa:bb:cc:dd:ee:ff".
 """
 
 from enum import Enum
-from collections import namedtuple
+from collections import namedtuple, deque
+from collections.abc import Mapping
 import time
 import socket
 import select
+import selectors
 import struct
 import itertools
 import queue
+import heapq
+import contextlib
+import functools
+import random
 import threading
+import asyncio
 
 class CreateConnectionChannelError(Enum):
 	NoError = 0
@@ -197,7 +204,7 @@ class ButtonConnectionChannel:
 		with self._client._lock:
 			self._latency_mode = latency_mode
 			if not self._client._closed:
-				self._client._send_command("CmdChangeModeParameters", {"conn_id": self._conn_id, "latency_mode": self._latency_mode, "auto_disconnect_time": self._auto_disconnect_time})
+				self._client._send_command("CmdChangeModeParameters", self._conn_id, self._latency_mode, self._auto_disconnect_time)
 	
 	@property
 	def auto_disconnect_time(self):
@@ -212,30 +219,152 @@ class ButtonConnectionChannel:
 		with self._client._lock:
 			self._auto_disconnect_time = auto_disconnect_time
 			if not self._client._closed:
-				self._client._send_command("CmdChangeModeParameters", {"conn_id": self._conn_id, "latency_mode": self._latency_mode, "auto_disconnect_time": self._auto_disconnect_time})
+				self._client._send_command("CmdChangeModeParameters", self._conn_id, self._latency_mode, self._auto_disconnect_time)
 
-class FlicClient:
-	"""FlicClient class.
+# Both directions are cached, so that every packet from the same button yields the same string object
+@functools.lru_cache(maxsize=1024)
+def _bdaddr_bytes_to_string(bdaddr_bytes):
+	return ":".join(map(lambda x: "%02x" % x, reversed(bdaddr_bytes)))
+
+@functools.lru_cache(maxsize=1024)
+def _bdaddr_string_to_bytes(bdaddr_string):
+	return bytes.fromhex("".join(reversed(bdaddr_string.split(":"))))
+
+def intern_bd_addr(bd_addr):
+	"""Return the canonical (lower case) string object used for a bd addr in the events reported by the clients.
 	
-	When this class is constructed, a socket connection is established.
-	You may then send commands to the server and set timers.
-	Once you are ready with the initialization you must call the handle_events() method which is a main loop that never exits, unless the socket is closed.
-	For a more detailed description of all commands, events and enums, check the protocol specification.
+	Dictionaries keyed by interned bd addrs can be looked up with the bd addrs passed to callbacks without comparing any characters.
+	"""
+	return _bdaddr_bytes_to_string(_bdaddr_string_to_bytes(bd_addr))
+
+def _enum_lookup(enum):
+	return dict((member.value, member) for member in enum).__getitem__
+
+def _decode_uuid(uuid_bytes):
+	uuid = uuid_bytes.hex()
+	return None if uuid == "00000000000000000000000000000000" else uuid
+
+def _decode_color(color_bytes):
+	return color_bytes.decode("utf-8") or None
+
+# Converts event fields whose data type is not supported by struct, keyed by field name
+_EVENT_FIELD_CONVERTERS = {
+	"bd_addr": _bdaddr_bytes_to_string,
+	"my_bd_addr": _bdaddr_bytes_to_string,
+	"name": lambda name_bytes: name_bytes.decode("utf-8"),
+	"uuid": _decode_uuid,
+	"color": _decode_color,
+	"error": _enum_lookup(CreateConnectionChannelError),
+	"connection_status": _enum_lookup(ConnectionStatus),
+	"disconnect_reason": _enum_lookup(DisconnectReason),
+	"removed_reason": _enum_lookup(RemovedReason),
+	"click_type": _enum_lookup(ClickType),
+	"bluetooth_controller_state": _enum_lookup(BluetoothControllerState),
+	"my_bd_addr_type": _enum_lookup(BdAddrType),
+	"state": _enum_lookup(BluetoothControllerState),
+	"result": _enum_lookup(ScanWizardResult)
+}
+
+class _Event(Mapping):
+	"""Base class of the decoded events, which have one slot per event field.
 	
-	All commands are wrapped in more high level functions and events are reported using callback functions.
+	Fields can be read both as attributes and by key, e.g. info.my_bd_addr or info["my_bd_addr"].
+	Like the dicts events used to be, they are (read-only) mappings: info.get("my_bd_addr"), "my_bd_addr" in info, dict(info) and == with a dict work.
+	"""
 	
-	All methods called on this class will take effect only if you eventually call the handle_events() method.
+	__slots__ = ()
 	
-	The ButtonScanner is used to set up a handler for advertisement packets.
-	The ButtonConnectionChannel is used to interact with connections to flic buttons and receive their events.
-	The BatteryStatusListener is used to get battery level.
+	def __getitem__(self, key):
+		if key not in self.__slots__:
+			raise KeyError(key)
+		return getattr(self, key)
 	
-	Other events are handled by the following callback functions that can be assigned to this object (and a list of the callback function parameters):
-	on_new_verified_button: bd_addr
-	on_no_space_for_new_connection: max_concurrently_connected_buttons
-	on_got_space_for_new_connection: max_concurrently_connected_buttons
-	on_bluetooth_controller_state_change: state
+	def __contains__(self, key):
+		return key in self.__slots__
+	
+	def __iter__(self):
+		return iter(self.__slots__)
+	
+	def __len__(self):
+		return len(self.__slots__)
+	
+	def __repr__(self):
+		return "%s(%s)" % (type(self).__name__, ", ".join("%s=%r" % (field, getattr(self, field)) for field in self.__slots__))
+
+def _make_event_class(name, field_names):
+	# Like namedtuple, generate __init__ so that creating an event is a single call without any loop
+	source = "def __init__(self%s):\n\tpass\n" % "".join(", " + field for field in field_names)
+	source += "".join("\tself.%s = %s\n" % (field, field) for field in field_names)
+	namespace = {}
+	exec(source, namespace)
+	return type(name, (_Event,), {"__slots__": field_names, "__init__": namespace["__init__"]})
+
+def _make_event_decoder(name, format, fields):
+	"""Build a decoder turning a raw event packet (opcode included) into an event object."""
+	event_struct = struct.Struct(format)
+	unpack_from = event_struct.unpack_from
+	field_names = tuple(fields.split())
+	converters = tuple((i, _EVENT_FIELD_CONVERTERS[field]) for i, field in enumerate(field_names) if field in _EVENT_FIELD_CONVERTERS)
+	
+	if name == "EvtGetInfoResponse":
+		event_class = _make_event_class(name, field_names + ("bd_addr_of_verified_buttons",))
+		pos = 1 + event_struct.size
+		
+		def decode(data):
+			values = list(unpack_from(data, 1))
+			for i, convert in converters:
+				values[i] = convert(values[i])
+			bd_addr_of_verified_buttons = [_bdaddr_bytes_to_string(bytes(data[i : i + 6])) for i in range(pos, pos + 6 * values[-1], 6)]
+			return event_class(*values, bd_addr_of_verified_buttons)
+	elif len(converters) == 0:
+		event_class = _make_event_class(name, field_names)
+		
+		def decode(data):
+			return event_class(*unpack_from(data, 1))
+	else:
+		event_class = _make_event_class(name, field_names)
+		
+		def decode(data):
+			values = list(unpack_from(data, 1))
+			for i, convert in converters:
+				values[i] = convert(values[i])
+			return event_class(*values)
+	
+	return decode
+
+def _enum_value(value):
+	return value.value if isinstance(value, Enum) else value
+
+# Converts command fields whose data type is not supported by struct, keyed by field name
+_COMMAND_FIELD_CONVERTERS = {
+	"bd_addr": _bdaddr_string_to_bytes,
+	"latency_mode": _enum_value
+}
+
+def _make_command_encoder(opcode, name, format, fields):
+	"""Build an encoder packing a command, including its length and opcode header, into the start of a buffer.
+	
+	The encoder takes the buffer followed by the field values in the order they are listed in _COMMANDS.
 	"""
+	command_struct = struct.Struct("<HB" + format.lstrip("<"))
+	pack_into = command_struct.pack_into
+	length = command_struct.size - 2
+	converters = tuple((i, _COMMAND_FIELD_CONVERTERS[field]) for i, field in enumerate(fields.split()) if field in _COMMAND_FIELD_CONVERTERS)
+	
+	if len(converters) == 0:
+		def encode(buffer, *values):
+			pack_into(buffer, 0, length, opcode, *values)
+	else:
+		def encode(buffer, *values):
+			values = list(values)
+			for i, convert in converters:
+				values[i] = convert(values[i])
+			pack_into(buffer, 0, length, opcode, *values)
+	
+	return encode
+
+class _FlicClientBase:
+	"""Protocol state, commands and event handling shared by FlicClient and AsyncFlicClient."""
 	
 	_EVENTS = [
 		("EvtAdvertisementPacket", "<I6s17pb??", "scan_id bd_addr name rssi is_private already_verified"),
@@ -260,8 +389,7 @@ class FlicClient:
 		("EvtButtonDeleted", "<6s?", "bd_addr deleted_by_this_client"),
 		("EvtBatteryStatus", "<Ibq", "listener_id battery_percentage timestamp")
 	]
-	_EVENT_STRUCTS = list(map(lambda x: None if x == None else struct.Struct(x[1]), _EVENTS))
-	_EVENT_NAMED_TUPLES = list(map(lambda x: None if x == None else namedtuple(x[0], x[2]), _EVENTS))
+	_EVENT_DECODERS = list(map(lambda x: _make_event_decoder(*x), _EVENTS))
 	
 	_COMMANDS = [
 		("CmdGetInfo", "", ""),
@@ -280,27 +408,16 @@ class FlicClient:
 		("CmdRemoveBatteryStatusListener", "<I", "listener_id")
 	]
 	
-	_COMMAND_STRUCTS = list(map(lambda x: struct.Struct(x[1]), _COMMANDS))
-	_COMMAND_NAMED_TUPLES = list(map(lambda x: namedtuple(x[0], x[2]), _COMMANDS))
+	_COMMAND_SIZES = list(map(lambda x: 3 + struct.calcsize(x[1]), _COMMANDS))
+	_COMMAND_ENCODERS = list(map(lambda x: _make_command_encoder(x[0], *x[1]), enumerate(_COMMANDS)))
 	_COMMAND_NAME_TO_OPCODE = dict((x[0], i) for i, x in enumerate(_COMMANDS))
 	
-	def _bdaddr_bytes_to_string(bdaddr_bytes):
-		return ":".join(map(lambda x: "%02x" % x, reversed(bdaddr_bytes)))
-	
-	def _bdaddr_string_to_bytes(bdaddr_string):
-		return bytearray.fromhex("".join(reversed(bdaddr_string.split(":"))))
-	
-	def __init__(self, host, port = 5551):
-		self._sock = socket.create_connection((host, port), None)
+	def __init__(self):
 		self._lock = threading.RLock()
 		self._scanners = {}
 		self._scan_wizards = {}
 		self._connection_channels = {}
 		self._battery_status_listeners = {}
-		self._get_info_response_queue = queue.Queue()
-		self._get_button_info_queue = queue.Queue()
-		self._timers = queue.PriorityQueue()
-		self._handle_event_thread_ident = None
 		self._closed = False
 		
 		self.on_new_verified_button = lambda bd_addr: None
@@ -309,16 +426,10 @@ class FlicClient:
 		self.on_bluetooth_controller_state_change = lambda state: None
 		self.on_button_deleted = lambda bd_addr, deleted_by_this_client: None
 	
-	def close(self):
-		"""Closes the client. The handle_events() method will return."""
-		with self._lock:
-			if self._closed:
-				return
-			
-			if threading.get_ident() != self._handle_event_thread_ident:
-				self._send_command("CmdPing", {"ping_id": 0}) # To unblock socket select
-			
-			self._closed = True
+	def __init_subclass__(cls, **kwargs):
+		super().__init_subclass__(**kwargs)
+		# Resolve the handlers on each subclass so that it may override how specific events are handled
+		cls._EVENT_DISPATCH = [(decode, getattr(cls, handler.__name__)) for decode, handler in zip(cls._EVENT_DECODERS, cls._EVENT_HANDLERS)]
 	
 	def add_scanner(self, scanner):
 		"""Add a ButtonScanner object.
@@ -330,7 +441,7 @@ class FlicClient:
 				return
 			
 			self._scanners[scanner._scan_id] = scanner
-			self._send_command("CmdCreateScanner", {"scan_id": scanner._scan_id})
+			self._send_command("CmdCreateScanner", scanner._scan_id)
 	
 	def remove_scanner(self, scanner):
 		"""Remove a ButtonScanner object.
@@ -342,7 +453,7 @@ class FlicClient:
 				return
 			
 			del self._scanners[scanner._scan_id]
-			self._send_command("CmdRemoveScanner", {"scan_id": scanner._scan_id})
+			self._send_command("CmdRemoveScanner", scanner._scan_id)
 	
 	def add_scan_wizard(self, scan_wizard):
 		"""Add a ScanWizard object.
@@ -354,7 +465,7 @@ class FlicClient:
 				return
 			
 			self._scan_wizards[scan_wizard._scan_wizard_id] = scan_wizard
-			self._send_command("CmdCreateScanWizard", {"scan_wizard_id": scan_wizard._scan_wizard_id})
+			self._send_command("CmdCreateScanWizard", scan_wizard._scan_wizard_id)
 	
 	def cancel_scan_wizard(self, scan_wizard):
 		"""Cancel a ScanWizard.
@@ -366,7 +477,7 @@ class FlicClient:
 			if scan_wizard._scan_wizard_id not in self._scan_wizards:
 				return
 			
-			self._send_command("CmdCancelScanWizard", {"scan_wizard_id": scan_wizard._scan_wizard_id})
+			self._send_command("CmdCancelScanWizard", scan_wizard._scan_wizard_id)
 	
 	def add_connection_channel(self, channel):
 		"""Adds a connection channel to a specific Flic button.
@@ -386,7 +497,7 @@ class FlicClient:
 			channel._client = self
 			
 			self._connection_channels[channel._conn_id] = channel
-			self._send_command("CmdCreateConnectionChannel", {"conn_id": channel._conn_id, "bd_addr": channel.bd_addr, "latency_mode": channel._latency_mode, "auto_disconnect_time": channel._auto_disconnect_time})
+			self._send_command("CmdCreateConnectionChannel", channel._conn_id, channel.bd_addr, channel._latency_mode, channel._auto_disconnect_time)
 	
 	def remove_connection_channel(self, channel):
 		"""Remove a connection channel.
@@ -398,7 +509,7 @@ class FlicClient:
 			if channel._conn_id not in self._connection_channels:
 				return
 			
-			self._send_command("CmdRemoveConnectionChannel", {"conn_id": channel._conn_id})
+			self._send_command("CmdRemoveConnectionChannel", channel._conn_id)
 	
 	def add_battery_status_listener(self, listener):
 		"""Adds a battery status listener for a specific Flic button.
@@ -408,7 +519,7 @@ class FlicClient:
 				return
 			
 			self._battery_status_listeners[listener._listener_id] = listener
-			self._send_command("CmdCreateBatteryStatusListener", {"listener_id": listener._listener_id, "bd_addr": listener._bd_addr})
+			self._send_command("CmdCreateBatteryStatusListener", listener._listener_id, listener._bd_addr)
 	
 	def remove_battery_status_listener(self, listener):
 		"""Remove a battery status listener.
@@ -418,30 +529,293 @@ class FlicClient:
 				return
 			
 			del self._battery_status_listeners[listener._listener_id]
-			self._send_command("CmdRemoveBatteryStatusListener", {"listener_id": listener._listener_id})
+			self._send_command("CmdRemoveBatteryStatusListener", listener._listener_id)
 	
 	def force_disconnect(self, bd_addr):
 		"""Force disconnection or cancel pending connection of a specific Flic button.
 		
 		This removes all connection channels for all clients connected to the server for this specific Flic button.
 		"""
-		self._send_command("CmdForceDisconnect", {"bd_addr": bd_addr})
+		self._send_command("CmdForceDisconnect", bd_addr)
+	
+	def delete_button(self, bd_addr):
+		"""Delete a verified button.
+		"""
+		self._send_command("CmdDeleteButton", bd_addr)
+	
+	def _encode_command(self, name, *values):
+		opcode = _FlicClientBase._COMMAND_NAME_TO_OPCODE[name]
+		bytes = bytearray(_FlicClientBase._COMMAND_SIZES[opcode])
+		_FlicClientBase._COMMAND_ENCODERS[opcode](bytes, *values)
+		return bytes
+	
+	def _dispatch_event(self, data):
+		if len(data) == 0:
+			return
+		opcode = data[0]
+		
+		if opcode >= len(self._EVENT_DISPATCH):
+			return
+		
+		decode, handle = self._EVENT_DISPATCH[opcode]
+		handle(self, decode(data))
+	
+	def _on_advertisement_packet(self, event):
+		scanner = self._scanners.get(event.scan_id)
+		if scanner is not None:
+			scanner.on_advertisement_packet(scanner, event.bd_addr, event.name, event.rssi, event.is_private, event.already_verified)
+	
+	def _on_create_connection_channel_response(self, event):
+		channel = self._connection_channels[event.conn_id]
+		if event.error != CreateConnectionChannelError.NoError:
+			del self._connection_channels[event.conn_id]
+		channel.on_create_connection_channel_response(channel, event.error, event.connection_status)
+	
+	def _on_connection_status_changed(self, event):
+		channel = self._connection_channels[event.conn_id]
+		channel.on_connection_status_changed(channel, event.connection_status, event.disconnect_reason)
+	
+	def _on_connection_channel_removed(self, event):
+		channel = self._connection_channels[event.conn_id]
+		del self._connection_channels[event.conn_id]
+		channel.on_removed(channel, event.removed_reason)
+	
+	def _on_button_up_or_down(self, event):
+		channel = self._connection_channels[event.conn_id]
+		channel.on_button_up_or_down(channel, event.click_type, event.was_queued, event.time_diff)
+	
+	def _on_button_click_or_hold(self, event):
+		channel = self._connection_channels[event.conn_id]
+		channel.on_button_click_or_hold(channel, event.click_type, event.was_queued, event.time_diff)
+	
+	def _on_button_single_or_double_click(self, event):
+		channel = self._connection_channels[event.conn_id]
+		channel.on_button_single_or_double_click(channel, event.click_type, event.was_queued, event.time_diff)
+	
+	def _on_button_single_or_double_click_or_hold(self, event):
+		channel = self._connection_channels[event.conn_id]
+		channel.on_button_single_or_double_click_or_hold(channel, event.click_type, event.was_queued, event.time_diff)
+	
+	def _on_new_verified_button(self, event):
+		self.on_new_verified_button(event.bd_addr)
+	
+	def _on_get_info_response(self, event):
+		self._get_info_response_queue.get()(event)
+	
+	def _on_no_space_for_new_connection(self, event):
+		self.on_no_space_for_new_connection(event.max_concurrently_connected_buttons)
+	
+	def _on_got_space_for_new_connection(self, event):
+		self.on_got_space_for_new_connection(event.max_concurrently_connected_buttons)
+	
+	def _on_bluetooth_controller_state_change(self, event):
+		self.on_bluetooth_controller_state_change(event.state)
+	
+	def _on_ping_response(self, event):
+		pass
+	
+	def _on_get_button_info_response(self, event):
+		self._get_button_info_queue.get()[1](event.bd_addr, event.uuid, event.color)
+	
+	def _on_scan_wizard_found_private_button(self, event):
+		scan_wizard = self._scan_wizards[event.scan_wizard_id]
+		scan_wizard.on_found_private_button(scan_wizard)
+	
+	def _on_scan_wizard_found_public_button(self, event):
+		scan_wizard = self._scan_wizards[event.scan_wizard_id]
+		scan_wizard._bd_addr = event.bd_addr
+		scan_wizard._name = event.name
+		scan_wizard.on_found_public_button(scan_wizard, scan_wizard._bd_addr, scan_wizard._name)
+	
+	def _on_scan_wizard_button_connected(self, event):
+		scan_wizard = self._scan_wizards[event.scan_wizard_id]
+		scan_wizard.on_button_connected(scan_wizard, scan_wizard._bd_addr, scan_wizard._name)
+	
+	def _on_scan_wizard_completed(self, event):
+		scan_wizard = self._scan_wizards[event.scan_wizard_id]
+		del self._scan_wizards[event.scan_wizard_id]
+		scan_wizard.on_completed(scan_wizard, event.result, scan_wizard._bd_addr, scan_wizard._name)
+	
+	def _on_button_deleted(self, event):
+		self.on_button_deleted(event.bd_addr, event.deleted_by_this_client)
+	
+	def _on_battery_status(self, event):
+		listener = self._battery_status_listeners.get(event.listener_id)
+		if listener is not None:
+			listener.on_battery_status(listener, event.battery_percentage, event.timestamp)
+	
+	# Indexed by opcode, in the same order as _EVENTS
+	_EVENT_HANDLERS = [
+		_on_advertisement_packet,
+		_on_create_connection_channel_response,
+		_on_connection_status_changed,
+		_on_connection_channel_removed,
+		_on_button_up_or_down,
+		_on_button_click_or_hold,
+		_on_button_single_or_double_click,
+		_on_button_single_or_double_click_or_hold,
+		_on_new_verified_button,
+		_on_get_info_response,
+		_on_no_space_for_new_connection,
+		_on_got_space_for_new_connection,
+		_on_bluetooth_controller_state_change,
+		_on_ping_response,
+		_on_get_button_info_response,
+		_on_scan_wizard_found_private_button,
+		_on_scan_wizard_found_public_button,
+		_on_scan_wizard_button_connected,
+		_on_scan_wizard_completed,
+		_on_button_deleted,
+		_on_battery_status
+	]
+
+class TimerHandle:
+	"""TimerHandle class.
+	
+	Returned by FlicClient.set_timer(). Call cancel() to prevent the timer callback from running.
+	"""
+	
+	def __init__(self, callback):
+		self._callback = callback
+		self._cancelled = False
+	
+	@property
+	def cancelled(self):
+		return self._cancelled
+	
+	def cancel(self):
+		"""Cancel the timer. Has no effect if the timer callback has already run."""
+		self._cancelled = True
+	
+	def _run(self):
+		if not self._cancelled:
+			self._callback()
+
+class FlicClient(_FlicClientBase):
+	"""FlicClient class.
+	
+	When this class is constructed, a socket connection is established.
+	You may then send commands to the server and set timers.
+	Once you are ready with the initialization you must call the handle_events() method which is a main loop that never exits, unless the socket is closed.
+	For a more detailed description of all commands, events and enums, check the protocol specification.
+	
+	All commands are wrapped in more high level functions and events are reported using callback functions.
+	
+	All methods called on this class will take effect only if you eventually call the handle_events() method.
+	
+	The ButtonScanner is used to set up a handler for advertisement packets.
+	The ButtonConnectionChannel is used to interact with connections to flic buttons and receive their events.
+	The BatteryStatusListener is used to get battery level.
+	
+	Other events are handled by the following callback functions that can be assigned to this object (and a list of the callback function parameters):
+	on_new_verified_button: bd_addr
+	on_no_space_for_new_connection: max_concurrently_connected_buttons
+	on_got_space_for_new_connection: max_concurrently_connected_buttons
+	on_bluetooth_controller_state_change: state
+	
+	Commands can be grouped into a single write using the batch() context manager. If cork_millis is set, commands issued from threads other than the one
+	handling events are held back for at most that many milliseconds so that they are written together.
+	
+	If reconnect is True, a lost connection to the server is reestablished with exponential backoff and jitter instead of making handle_events() return.
+	Reconnect attempts connect on a helper thread, so an unreachable server doesn't hold up the events of the other clients of a FlicClientPool.
+	Once reconnected, all scanners, connection channels and battery status listeners are added to the server again and pending get_info and
+	get_button_info requests are sent again. Scan wizards cannot be resumed and complete with WizardFailedTimeout. The following callbacks report this:
+	on_connection_lost: (no parameters)
+	on_reconnected: recovery_time (seconds from losing the connection until the state was replayed)
+	"""
+	
+	# A packet is a 2 byte length prefix followed by at most 0xffff bytes
+	_MAX_PACKET_SIZE = 2 + 0xffff
+	_RECV_BUFFER_SIZE = 2 * _MAX_PACKET_SIZE
+	
+	_RECONNECT_MIN_DELAY = 0.25 # in seconds
+	_RECONNECT_MAX_DELAY = 30.0 # in seconds
+	_RECONNECT_CONNECT_TIMEOUT = 5.0 # in seconds
+	
+	def __init__(self, host, port = 5551, cork_millis = 0, reconnect = False):
+		super().__init__()
+		self._address = (host, port)
+		self._sock = socket.create_connection(self._address, None)
+		self._get_info_response_queue = queue.Queue()
+		self._get_button_info_queue = queue.Queue()
+		self._timers = []
+		self._timers_lock = threading.Lock()
+		self._timer_seq = itertools.count()
+		self._wakeup_reader, self._wakeup_writer = socket.socketpair()
+		self._wakeup_reader.setblocking(False)
+		self._wakeup_writer.setblocking(False)
+		self._recv_buffer = bytearray(FlicClient._RECV_BUFFER_SIZE)
+		self._recv_view = memoryview(self._recv_buffer)
+		self._recv_start = 0
+		self._recv_end = 0
+		self._handle_event_thread_ident = None
+		self._write_buffer = bytearray()
+		# Commands are packed into this buffer before being sent, _command_views[opcode] is the part of it holding a command with that opcode
+		self._command_buffer = bytearray(max(FlicClient._COMMAND_SIZES))
+		self._command_views = [memoryview(self._command_buffer)[:size] for size in FlicClient._COMMAND_SIZES]
+		self._batch_depth = 0
+		self._cork_millis = cork_millis
+		self._cork_timer = None
+		self._reconnect = reconnect
+		self._reconnect_attempts = 0
+		self._connection_lost_time = None
+		
+		self.on_connection_lost = lambda: None
+		self.on_reconnected = lambda recovery_time: None
+	
+	def close(self):
+		"""Closes the client. The handle_events() method will return."""
+		with self._lock:
+			if self._closed:
+				return
+			
+			self._flush()
+			self._closed = True
+		
+		if threading.get_ident() != self._handle_event_thread_ident:
+			self._wake_up()
+	
+	@contextlib.contextmanager
+	def batch(self):
+		"""Send all commands issued within a with block in a single write.
+		
+		Usage:
+		with client.batch():
+			client.add_connection_channel(channel1)
+			client.add_connection_channel(channel2)
+		
+		Batches may be nested, the commands are written once the outermost batch exits.
+		Other threads sending commands meanwhile will block until the batch has been written.
+		"""
+		with self._lock:
+			self._batch_depth += 1
+			try:
+				yield self
+			finally:
+				self._batch_depth -= 1
+				if self._batch_depth == 0:
+					self._flush()
+	
+	def add_connection_channels(self, channels):
+		"""Adds several connection channels at once, see add_connection_channel().
+		
+		All commands are sent to the server in a single write.
+		"""
+		with self.batch():
+			for channel in channels:
+				self.add_connection_channel(channel)
 	
 	def get_info(self, callback):
 		"""Get info about the current state of the server.
 		
 		The server will send back its information directly and the callback will be called once the response arrives.
-		The callback takes only one parameter: info. This info parameter is a dictionary with the following objects:
+		The callback takes only one parameter: info. This info parameter is an event object, whose fields can be read as attributes or by key, with the following fields:
 		bluetooth_controller_state, my_bd_addr, my_bd_addr_type, max_pending_connections, max_concurrently_connected_buttons,
 		current_pending_connections, currently_no_space_for_new_connection, bd_addr_of_verified_buttons (a list of bd addresses).
 		"""
-		self._get_info_response_queue.put(callback)
-		self._send_command("CmdGetInfo", {})
-	
-	def delete_button(self, bd_addr):
-		"""Delete a verified button.
-		"""
-		self._send_command("CmdDeleteButton", {"bd_addr": bd_addr})
+		with self._lock:
+			self._get_info_response_queue.put(callback)
+			self._send_command("CmdGetInfo")
 	
 	def get_button_info(self, bd_addr, callback):
 		"""Get button info for a verified button.
@@ -454,19 +828,26 @@ class FlicClient:
 		Note: if the button isn't verified, the uuid sent to the callback will rather be None.
 		"""
 		with self._lock:
-			self._get_button_info_queue.put(callback)
-			self._send_command("CmdGetButtonInfo", {"bd_addr": bd_addr})
+			self._get_button_info_queue.put((bd_addr, callback))
+			self._send_command("CmdGetButtonInfo", bd_addr)
 	
 	def set_timer(self, timeout_millis, callback):
 		"""Set a timer
 		
 		This timer callback will run after the specified timeout_millis on the thread that handles the events.
+		Returns a TimerHandle which can be used to cancel the timer before it has run.
 		"""
+		handle = TimerHandle(callback)
 		point_in_time = time.monotonic() + timeout_millis / 1000.0
-		self._timers.put((point_in_time, callback))
+		with self._timers_lock:
+			heapq.heappush(self._timers, (point_in_time, next(self._timer_seq), handle))
+			is_next_timer = self._timers[0][2] is handle
 		
-		if threading.get_ident() != self._handle_event_thread_ident:
-			self._send_command("CmdPing", {"ping_id": 0}) # To unblock socket select
+		# The event thread only needs to recompute its select timeout if this timer is due before all others
+		if is_next_timer and threading.get_ident() != self._handle_event_thread_ident:
+			self._wake_up()
+		
+		return handle
 	
 	def run_on_handle_events_thread(self, callback):
 		"""Run a function on the thread that handles the events."""
@@ -475,197 +856,220 @@ class FlicClient:
 		else:
 			self.set_timer(0, callback)
 	
-	def _send_command(self, name, items):
-		for key, value in items.items():
-			if isinstance(value, Enum):
-				items[key] = value.value
-		
-		if "bd_addr" in items:
-			items["bd_addr"] = FlicClient._bdaddr_string_to_bytes(items["bd_addr"])
-		
+	def _send_command(self, name, *values):
 		opcode = FlicClient._COMMAND_NAME_TO_OPCODE[name]
-		data_bytes = FlicClient._COMMAND_STRUCTS[opcode].pack(*FlicClient._COMMAND_NAMED_TUPLES[opcode](**items))
-		bytes = bytearray(3)
-		bytes[0] = (len(data_bytes) + 1) & 0xff
-		bytes[1] = (len(data_bytes) + 1) >> 8
-		bytes[2] = opcode
-		bytes += data_bytes
 		with self._lock:
-			if not self._closed:
-				self._sock.sendall(bytes)
+			if self._closed:
+				return
+			
+			FlicClient._COMMAND_ENCODERS[opcode](self._command_buffer, *values)
+			command = self._command_views[opcode]
+			
+			if self._batch_depth > 0:
+				self._write_buffer += command
+			elif self._cork_millis > 0 and threading.get_ident() != self._handle_event_thread_ident:
+				# Hold back commands from other threads for a short while so that bursts of them go out in a single write
+				self._write_buffer += command
+				if self._cork_timer is None:
+					self._cork_timer = self.set_timer(self._cork_millis, self._flush)
+			elif len(self._write_buffer) > 0:
+				self._write_buffer += command
+				self._flush()
+			else:
+				self._write(command)
 	
-	def _dispatch_event(self, data):
-		if len(data) == 0:
+	def _flush(self):
+		with self._lock:
+			if self._cork_timer is not None:
+				self._cork_timer.cancel()
+				self._cork_timer = None
+			
+			if len(self._write_buffer) > 0 and not self._closed:
+				self._write(self._write_buffer)
+			del self._write_buffer[:]
+	
+	def _write(self, data):
+		if self._sock is None:
+			# Disconnected, the state is replayed once reconnected
 			return
-		opcode = data[0]
 		
-		if opcode >= len(FlicClient._EVENTS) or FlicClient._EVENTS[opcode] == None:
-			return
+		try:
+			self._sock.sendall(data)
+		except OSError:
+			if not self._reconnect:
+				raise
+			# The thread handling events notices the broken connection when reading and reconnects
+	
+	def _wake_up(self):
+		try:
+			self._wakeup_writer.send(b"\0")
+		except OSError:
+			# Either a wake up is already pending or the client has been torn down
+			pass
+	
+	def _next_timer(self):
+		"""Pop the next timer if it is due, otherwise return the number of seconds until it is (None if there are no timers)."""
+		with self._timers_lock:
+			while len(self._timers) > 0:
+				point_in_time, _, handle = self._timers[0]
+				if handle._cancelled:
+					heapq.heappop(self._timers)
+					continue
+				timeout = point_in_time - time.monotonic()
+				if timeout <= 0:
+					heapq.heappop(self._timers)
+					return handle
+				return timeout
+			return None
+	
+	def _handle_one_event(self):
+		timer = self._next_timer()
+		if isinstance(timer, TimerHandle):
+			timer._run()
+			return True
 		
-		event_name = FlicClient._EVENTS[opcode][0]
-		data_tuple = FlicClient._EVENT_STRUCTS[opcode].unpack(data[1 : 1 + FlicClient._EVENT_STRUCTS[opcode].size])
-		items = FlicClient._EVENT_NAMED_TUPLES[opcode]._make(data_tuple)._asdict()
+		if self._sock is None:
+			# Waiting for the next reconnect attempt
+			if len(select.select([self._wakeup_reader], [], [], timer)[0]) > 0:
+				self._drain_wakeup()
+			return True
 		
-		# Process some kind of items whose data type is not supported by struct
-		if "bd_addr" in items:
-			items["bd_addr"] = FlicClient._bdaddr_bytes_to_string(items["bd_addr"])
+		readable = select.select([self._sock, self._wakeup_reader], [], [], timer)[0]
+		if self._wakeup_reader in readable:
+			self._drain_wakeup()
+		if self._sock not in readable:
+			return True
 		
-		if "name" in items:
-			items["name"] = items["name"].decode("utf-8")
+		return self._receive() or self._connection_lost()
+	
+	def _drain_wakeup(self):
+		try:
+			self._wakeup_reader.recv(4096)
+		except BlockingIOError:
+			pass
+	
+	def _receive(self):
+		"""Read what the socket has and dispatch all complete packets. Returns False if the server closed the connection."""
+		try:
+			nbytes = self._sock.recv_into(self._recv_view[self._recv_end:])
+		except OSError:
+			if not self._reconnect:
+				raise
+			return False
+		if nbytes == 0:
+			return False
+		self._recv_end += nbytes
 		
-		if event_name == "EvtCreateConnectionChannelResponse":
-			items["error"] = CreateConnectionChannelError(items["error"])
-			items["connection_status"] = ConnectionStatus(items["connection_status"])
+		# Dispatch every complete length-prefixed packet currently buffered
+		buf = self._recv_buffer
+		pos = self._recv_start
+		end = self._recv_end
+		while end - pos >= 2 and not self._closed:
+			packet_end = pos + 2 + (buf[pos] | (buf[pos + 1] << 8))
+			if packet_end > end:
+				break
+			self._dispatch_event(self._recv_view[pos + 2 : packet_end])
+			pos = packet_end
 		
-		if event_name == "EvtConnectionStatusChanged":
-			items["connection_status"] = ConnectionStatus(items["connection_status"])
-			items["disconnect_reason"] = DisconnectReason(items["disconnect_reason"])
+		if pos == end:
+			pos = end = 0
+		elif len(buf) - end < FlicClient._MAX_PACKET_SIZE:
+			# Move the trailing partial packet to the front to make room for the rest of it
+			buf[0 : end - pos] = buf[pos : end]
+			pos, end = 0, end - pos
+		self._recv_start = pos
+		self._recv_end = end
+		return True
+	
+	def _connection_lost(self):
+		"""Start reconnecting after the server closed the connection. Returns False if this client does not reconnect."""
+		if not self._reconnect or self._closed:
+			return False
 		
-		if event_name == "EvtConnectionChannelRemoved":
-			items["removed_reason"] = RemovedReason(items["removed_reason"])
+		with self._lock:
+			self._sock.close()
+			self._sock = None
+			self._recv_start = self._recv_end = 0
+			del self._write_buffer[:]
 		
-		if event_name == "EvtButtonUpOrDown" or event_name == "EvtButtonClickOrHold" or event_name == "EvtButtonSingleOrDoubleClick" or event_name == "EvtButtonSingleOrDoubleClickOrHold":
-			items["click_type"] = ClickType(items["click_type"])
+		self._connection_lost_time = time.monotonic()
+		self._reconnect_attempts = 0
 		
-		if event_name == "EvtGetInfoResponse":
-			items["bluetooth_controller_state"] = BluetoothControllerState(items["bluetooth_controller_state"])
-			items["my_bd_addr"] = FlicClient._bdaddr_bytes_to_string(items["my_bd_addr"])
-			items["my_bd_addr_type"] = BdAddrType(items["my_bd_addr_type"])
-			items["bd_addr_of_verified_buttons"] = []
-			
-			pos = FlicClient._EVENT_STRUCTS[opcode].size
-			for i in range(items["nb_verified_buttons"]):
-				items["bd_addr_of_verified_buttons"].append(FlicClient._bdaddr_bytes_to_string(data[1 + pos : 1 + pos + 6]))
-				pos += 6
-		
-		if event_name == "EvtBluetoothControllerStateChange":
-			items["state"] = BluetoothControllerState(items["state"])
-		
-		if event_name == "EvtGetButtonInfoResponse":
-			items["uuid"] = "".join(map(lambda x: "%02x" % x, items["uuid"]))
-			if items["uuid"] == "00000000000000000000000000000000":
-				items["uuid"] = None
-			items["color"] = items["color"].decode("utf-8")
-			if (items["color"] == ""):
-				items["color"] = None
-		
-		if event_name == "EvtScanWizardCompleted":
-			items["result"] = ScanWizardResult(items["result"])
-		
-		# Process event
-		if event_name == "EvtAdvertisementPacket":
-			scanner = self._scanners.get(items["scan_id"])
-			if scanner is not None:
-				scanner.on_advertisement_packet(scanner, items["bd_addr"], items["name"], items["rssi"], items["is_private"], items["already_verified"])
-		
-		if event_name == "EvtCreateConnectionChannelResponse":
-			channel = self._connection_channels[items["conn_id"]]
-			if items["error"] != CreateConnectionChannelError.NoError:
-				del self._connection_channels[items["conn_id"]]
-			channel.on_create_connection_channel_response(channel, items["error"], items["connection_status"])
-		
-		if event_name == "EvtConnectionStatusChanged":
-			channel = self._connection_channels[items["conn_id"]]
-			channel.on_connection_status_changed(channel, items["connection_status"], items["disconnect_reason"])
-		
-		if event_name == "EvtConnectionChannelRemoved":
-			channel = self._connection_channels[items["conn_id"]]
-			del self._connection_channels[items["conn_id"]]
-			channel.on_removed(channel, items["removed_reason"])
-		
-		if event_name == "EvtButtonUpOrDown":
-			channel = self._connection_channels[items["conn_id"]]
-			channel.on_button_up_or_down(channel, items["click_type"], items["was_queued"], items["time_diff"])
-		if event_name == "EvtButtonClickOrHold":
-			channel = self._connection_channels[items["conn_id"]]
-			channel.on_button_click_or_hold(channel, items["click_type"], items["was_queued"], items["time_diff"])
-		if event_name == "EvtButtonSingleOrDoubleClick":
-			channel = self._connection_channels[items["conn_id"]]
-			channel.on_button_single_or_double_click(channel, items["click_type"], items["was_queued"], items["time_diff"])
-		if event_name == "EvtButtonSingleOrDoubleClickOrHold":
-			channel = self._connection_channels[items["conn_id"]]
-			channel.on_button_single_or_double_click_or_hold(channel, items["click_type"], items["was_queued"], items["time_diff"])
-		
-		if event_name == "EvtNewVerifiedButton":
-			self.on_new_verified_button(items["bd_addr"])
-		
-		if event_name == "EvtGetInfoResponse":
-			self._get_info_response_queue.get()(items)
-		
-		if event_name == "EvtNoSpaceForNewConnection":
-			self.on_no_space_for_new_connection(items["max_concurrently_connected_buttons"])
-		
-		if event_name == "EvtGotSpaceForNewConnection":
-			self.on_got_space_for_new_connection(items["max_concurrently_connected_buttons"])
-		
-		if event_name == "EvtBluetoothControllerStateChange":
-			self.on_bluetooth_controller_state_change(items["state"])
-		
-		if event_name == "EvtGetButtonInfoResponse":
-			self._get_button_info_queue.get()(items["bd_addr"], items["uuid"], items["color"])
-		
-		if event_name == "EvtScanWizardFoundPrivateButton":
-			scan_wizard = self._scan_wizards[items["scan_wizard_id"]]
-			scan_wizard.on_found_private_button(scan_wizard)
-		
-		if event_name == "EvtScanWizardFoundPublicButton":
-			scan_wizard = self._scan_wizards[items["scan_wizard_id"]]
-			scan_wizard._bd_addr = items["bd_addr"]
-			scan_wizard._name = items["name"]
-			scan_wizard.on_found_public_button(scan_wizard, scan_wizard._bd_addr, scan_wizard._name)
-		
-		if event_name == "EvtScanWizardButtonConnected":
-			scan_wizard = self._scan_wizards[items["scan_wizard_id"]]
-			scan_wizard.on_button_connected(scan_wizard, scan_wizard._bd_addr, scan_wizard._name)
-		
-		if event_name == "EvtScanWizardCompleted":
-			scan_wizard = self._scan_wizards[items["scan_wizard_id"]]
-			del self._scan_wizards[items["scan_wizard_id"]]
-			scan_wizard.on_completed(scan_wizard, items["result"], scan_wizard._bd_addr, scan_wizard._name)
-		
-		if event_name == "EvtButtonDeleted":
-			self.on_button_deleted(items["bd_addr"], items["deleted_by_this_client"])
-		
-		if event_name == "EvtBatteryStatus":
-			listener = self._battery_status_listeners.get(items["listener_id"])
-			if listener is not None:
-				listener.on_battery_status(listener, items["battery_percentage"], items["timestamp"])
-	
-	def _handle_one_event(self):
-		if len(self._timers.queue) > 0:
-			current_timer = self._timers.queue[0]
-			timeout = max(current_timer[0] - time.monotonic(), 0)
-			if timeout == 0:
-				self._timers.get()[1]()
-				return True
-			if len(select.select([self._sock], [], [], timeout)[0]) == 0:
-				return True
-		
-		len_arr = bytearray(2)
-		view = memoryview(len_arr)
-		
-		toread = 2
-		while toread > 0:
-			nbytes = self._sock.recv_into(view, toread)
-			if nbytes == 0:
-				return False
-			view = view[nbytes:]
-			toread -= nbytes
-		
-		packet_len = len_arr[0] | (len_arr[1] << 8)
-		data = bytearray(packet_len)
-		view = memoryview(data)
-		toread = packet_len
-		while toread > 0:
-			nbytes = self._sock.recv_into(view, toread)
-			if nbytes == 0:
-				return False
-			view = view[nbytes:]
-			toread -= nbytes
-		
-		self._dispatch_event(data)
+		scan_wizards = list(self._scan_wizards.values())
+		self._scan_wizards.clear()
+		for scan_wizard in scan_wizards:
+			scan_wizard.on_completed(scan_wizard, ScanWizardResult.WizardFailedTimeout, scan_wizard._bd_addr, scan_wizard._name)
+		
+		self.on_connection_lost()
+		self._schedule_reconnect()
 		return True
+	
+	def _schedule_reconnect(self):
+		delay = min(FlicClient._RECONNECT_MIN_DELAY * 2 ** self._reconnect_attempts, FlicClient._RECONNECT_MAX_DELAY)
+		# Jitter spreads out the reconnects of many clients losing the same server at once
+		delay *= random.uniform(0.5, 1.0)
+		self._reconnect_attempts += 1
+		self.set_timer(delay * 1000.0, self._try_reconnect)
+	
+	def _try_reconnect(self):
+		if self._closed:
+			return
+		
+		# Resolving and connecting block, which would hold up the events of all other clients of a FlicClientPool
+		thread = threading.Thread(target=self._connect, name="FlicClient reconnect")
+		thread.daemon = True
+		thread.start()
+	
+	def _connect(self):
+		"""Runs on a helper thread and hands the outcome over to the thread handling events."""
+		try:
+			sock = socket.create_connection(self._address, FlicClient._RECONNECT_CONNECT_TIMEOUT)
+			sock.settimeout(None)
+		except OSError:
+			self.run_on_handle_events_thread(self._schedule_reconnect)
+			return
 		
+		if self._closed:
+			sock.close()
+			return
+		
+		self.run_on_handle_events_thread(functools.partial(self._reconnected, sock))
+	
+	def _reconnected(self, sock):
+		if self._closed:
+			sock.close()
+			return
+		
+		with self._lock:
+			self._sock = sock
+			self._replay_state()
+		
+		self.on_reconnected(time.monotonic() - self._connection_lost_time)
+	
+	def _replay_state(self):
+		with self.batch():
+			for scanner in self._scanners.values():
+				self._send_command("CmdCreateScanner", scanner._scan_id)
+			for channel in self._connection_channels.values():
+				self._send_command("CmdCreateConnectionChannel", channel._conn_id, channel.bd_addr, channel._latency_mode, channel._auto_disconnect_time)
+			for listener in self._battery_status_listeners.values():
+				self._send_command("CmdCreateBatteryStatusListener", listener._listener_id, listener._bd_addr)
+			# Responses to requests sent on the lost connection will never arrive, so ask again
+			with self._get_info_response_queue.mutex:
+				pending_get_info = len(self._get_info_response_queue.queue)
+			for i in range(pending_get_info):
+				self._send_command("CmdGetInfo")
+			with self._get_button_info_queue.mutex:
+				pending_get_button_info = list(self._get_button_info_queue.queue)
+			for bd_addr, callback in pending_get_button_info:
+				self._send_command("CmdGetButtonInfo", bd_addr)
+	
+	def _tear_down(self):
+		if self._sock is not None:
+			self._sock.close()
+		self._wakeup_reader.close()
+		self._wakeup_writer.close()
+	
 	def handle_events(self):
 		"""Start the main loop for this client.
 		
@@ -676,4 +1080,359 @@ class FlicClient:
 		while not self._closed:
 			if not self._handle_one_event():
 				break
-		self._sock.close()
+		self._tear_down()
+
+class FlicClientPool:
+	"""FlicClientPool class.
+	
+	Drives several FlicClient objects, e.g. one per flicd and Bluetooth controller, from a single thread and selector.
+	
+	Usage:
+	pool = FlicClientPool()
+	living_room = pool.connect("living-room.local")
+	bedroom = pool.connect("bedroom.local")
+	living_room.add_connection_channel(channel)
+	pool.get_info(lambda infos: ...)
+	pool.handle_events()
+	
+	Each client keeps its own scanners, connection channels and callbacks, so events from a server are reported on the objects added to its client.
+	Instead of calling handle_events() on the clients, call handle_events() on the pool. Timers set on the clients run on the thread handling the pool's events.
+	"""
+	
+	def __init__(self):
+		self._selector = selectors.DefaultSelector()
+		self._lock = threading.Lock()
+		self._clients = []
+		self._pending_clients = []
+		self._client_socks = {}
+		self._wakeup_reader, self._wakeup_writer = socket.socketpair()
+		self._wakeup_reader.setblocking(False)
+		self._wakeup_writer.setblocking(False)
+		self._selector.register(self._wakeup_reader, selectors.EVENT_READ, None)
+		self._handle_event_thread_ident = None
+		self._closed = False
+	
+	@property
+	def clients(self):
+		"""The clients currently driven by this pool, in the order they were added."""
+		with self._lock:
+			return self._clients + self._pending_clients
+	
+	def connect(self, host, port = 5551, **kwargs):
+		"""Create a FlicClient connected to the server at host and port, add it to this pool and return it."""
+		client = FlicClient(host, port, **kwargs)
+		self.add_client(client)
+		return client
+	
+	def add_client(self, client):
+		"""Add a FlicClient, which must not have its own handle_events() method running."""
+		with self._lock:
+			client._handle_event_thread_ident = self._handle_event_thread_ident
+			self._pending_clients.append(client)
+		
+		if threading.get_ident() != self._handle_event_thread_ident:
+			self._wake_up()
+	
+	def close(self):
+		"""Closes all clients and the pool. The handle_events() method will return."""
+		with self._lock:
+			if self._closed:
+				return
+			
+			self._closed = True
+			clients = self._clients + self._pending_clients
+		
+		for client in clients:
+			client.close()
+		self._wake_up()
+	
+	def get_info(self, callback):
+		"""Get info about the current state of all servers.
+		
+		The callback will be called once every server has responded, with one parameter: infos.
+		This is a list of (client, info) tuples in the order the clients were added, where info is what FlicClient.get_info() passes to its callback.
+		"""
+		clients = self.clients
+		if len(clients) == 0:
+			callback([])
+			return
+		
+		infos = [None] * len(clients)
+		remaining = [len(clients)]
+		
+		def on_info(i, client, info):
+			infos[i] = (client, info)
+			remaining[0] -= 1
+			if remaining[0] == 0:
+				callback(infos)
+		
+		for i, client in enumerate(clients):
+			client.get_info(functools.partial(on_info, i, client))
+	
+	def _wake_up(self):
+		try:
+			self._wakeup_writer.send(b"\0")
+		except OSError:
+			pass
+	
+	def _register_pending_clients(self):
+		with self._lock:
+			pending = self._pending_clients
+			self._pending_clients = []
+			for client in pending:
+				client._handle_event_thread_ident = self._handle_event_thread_ident
+				self._clients.append(client)
+		
+		for client in pending:
+			self._selector.register(client._wakeup_reader, selectors.EVENT_READ, client)
+			self._update_client_socket(client)
+	
+	def _update_client_socket(self, client):
+		# The socket of a client changes when it reconnects, and is None while it waits to do so
+		registered_sock = self._client_socks.get(client)
+		if client._sock is registered_sock:
+			return
+		
+		if registered_sock is not None:
+			self._selector.unregister(registered_sock)
+		if client._sock is not None:
+			self._selector.register(client._sock, selectors.EVENT_READ, client)
+		self._client_socks[client] = client._sock
+	
+	def _remove_client(self, client):
+		with self._lock:
+			self._clients.remove(client)
+		
+		registered_sock = self._client_socks.pop(client, None)
+		if registered_sock is not None:
+			self._selector.unregister(registered_sock)
+		self._selector.unregister(client._wakeup_reader)
+		client._closed = True
+		client._tear_down()
+	
+	def handle_events(self):
+		"""Start the main loop for all clients of this pool.
+		
+		This method will not return until the pool has been closed. Clients whose connection is closed are removed from the pool, unless they reconnect.
+		"""
+		with self._lock:
+			self._handle_event_thread_ident = threading.get_ident()
+		
+		while not self._closed:
+			self._register_pending_clients()
+			
+			# Run at most one due timer per client before polling the sockets again, like FlicClient.handle_events()
+			timeout = None
+			for client in list(self._clients):
+				timer = client._next_timer()
+				if isinstance(timer, TimerHandle):
+					timer._run()
+					timeout = 0
+				elif timer is not None and (timeout is None or timer < timeout):
+					timeout = timer
+				self._update_client_socket(client)
+			
+			for key, _ in self._selector.select(timeout):
+				client = key.data
+				if client is None:
+					try:
+						self._wakeup_reader.recv(4096)
+					except BlockingIOError:
+						pass
+				elif client._closed:
+					continue
+				elif key.fileobj is client._wakeup_reader:
+					client._drain_wakeup()
+				elif key.fileobj is not client._sock:
+					continue
+				elif client._receive() or client._connection_lost():
+					self._update_client_socket(client)
+				else:
+					self._remove_client(client)
+			
+			for client in list(self._clients):
+				if client._closed:
+					self._remove_client(client)
+		
+		self._register_pending_clients()
+		for client in list(self._clients):
+			self._remove_client(client)
+		self._selector.close()
+		self._wakeup_reader.close()
+		self._wakeup_writer.close()
+
+ButtonEvent = namedtuple("ButtonEvent", "channel kind click_type was_queued time_diff")
+ButtonEvent.__doc__ = """A button event yielded by AsyncFlicClient.button_events().
+
+kind is the name of the corresponding ButtonConnectionChannel callback without the "on_" prefix, e.g. "button_click_or_hold".
+"""
+
+class AsyncFlicClient(_FlicClientBase):
+	"""AsyncFlicClient class.
+	
+	Speaks the same protocol as FlicClient, but over asyncio streams instead of a blocking socket and threads.
+	
+	Usage:
+	client = await AsyncFlicClient.connect("localhost")
+	asyncio.ensure_future(client.handle_events())
+	info = await client.get_info()
+	channel = ButtonConnectionChannel(bd_addr)
+	client.add_connection_channel(channel)
+	async for event in client.button_events(channel):
+		...
+	
+	Scanners, scan wizards, connection channels, battery status listeners and the callback properties work just like on FlicClient,
+	except that all callbacks are called on the event loop. All methods must be called from the event loop running handle_events().
+	"""
+	
+	def __init__(self, reader, writer):
+		super().__init__()
+		self._reader = reader
+		self._writer = writer
+		self._get_info_response_queue = deque()
+		self._get_button_info_queue = deque()
+		self._button_event_queues = {}
+	
+	@classmethod
+	async def connect(cls, host, port = 5551):
+		"""Open a connection to the server and return a client using it."""
+		reader, writer = await asyncio.open_connection(host, port)
+		return cls(reader, writer)
+	
+	async def close(self):
+		"""Closes the client. The handle_events() coroutine will return."""
+		if self._closed:
+			return
+		
+		self._shut_down()
+		try:
+			await self._writer.wait_closed()
+		except OSError:
+			pass
+	
+	async def get_info(self):
+		"""Get info about the current state of the server.
+		
+		Returns the same info object as the one FlicClient.get_info() passes to its callback.
+		"""
+		return await self._request(self._get_info_response_queue, "CmdGetInfo")
+	
+	async def get_button_info(self, bd_addr):
+		"""Get button info for a verified button.
+		
+		Returns a tuple of bd_addr, uuid and color, with the same meaning as the parameters of the FlicClient.get_button_info() callback.
+		"""
+		return await self._request(self._get_button_info_queue, "CmdGetButtonInfo", bd_addr)
+	
+	def button_events(self, channel):
+		"""Get an asynchronous iterator of ButtonEvent objects for a connection channel.
+		
+		Events are queued from the moment this method is called, and iteration ends once the channel is removed or the client is closed.
+		The callback properties of the channel are still called as usual.
+		"""
+		events = asyncio.Queue()
+		self._button_event_queues.setdefault(channel._conn_id, []).append(events)
+		return self._iterate_button_events(channel._conn_id, events)
+	
+	async def _iterate_button_events(self, conn_id, events):
+		try:
+			while True:
+				event = await events.get()
+				if event is None:
+					return
+				yield event
+		finally:
+			queues = self._button_event_queues.get(conn_id)
+			if queues is not None and events in queues:
+				queues.remove(events)
+				if not queues:
+					del self._button_event_queues[conn_id]
+	
+	async def handle_events(self):
+		"""Run the main loop for this client.
+		
+		This coroutine will not return until the connection has been closed.
+		Once it has returned, any use of this AsyncFlicClient is illegal.
+		"""
+		try:
+			while not self._closed:
+				header = await self._reader.readexactly(2)
+				self._dispatch_event(await self._reader.readexactly(header[0] | (header[1] << 8)))
+		except (asyncio.IncompleteReadError, ConnectionError):
+			pass
+		finally:
+			self._shut_down()
+	
+	def _shut_down(self):
+		if not self._closed:
+			self._closed = True
+			self._writer.close()
+		
+		error = ConnectionError("Connection to the server was closed")
+		for future in itertools.chain(self._get_info_response_queue, self._get_button_info_queue):
+			if not future.done():
+				future.set_exception(error)
+		self._get_info_response_queue.clear()
+		self._get_button_info_queue.clear()
+		
+		for conn_id in list(self._button_event_queues):
+			self._end_button_events(conn_id)
+	
+	def _send_command(self, name, *values):
+		if not self._closed:
+			self._writer.write(self._encode_command(name, *values))
+	
+	def _request(self, response_queue, name, *values):
+		if self._closed:
+			raise ConnectionError("Connection to the server was closed")
+		
+		future = asyncio.get_running_loop().create_future()
+		response_queue.append(future)
+		self._send_command(name, *values)
+		return future
+	
+	def _put_button_event(self, kind, event):
+		queues = self._button_event_queues.get(event.conn_id)
+		if queues:
+			event = ButtonEvent(self._connection_channels[event.conn_id], kind, event.click_type, event.was_queued, event.time_diff)
+			for events in queues:
+				events.put_nowait(event)
+	
+	def _end_button_events(self, conn_id):
+		for events in self._button_event_queues.pop(conn_id, ()):
+			events.put_nowait(None)
+	
+	def _on_create_connection_channel_response(self, event):
+		_FlicClientBase._on_create_connection_channel_response(self, event)
+		if event.error != CreateConnectionChannelError.NoError:
+			self._end_button_events(event.conn_id)
+	
+	def _on_connection_channel_removed(self, event):
+		_FlicClientBase._on_connection_channel_removed(self, event)
+		self._end_button_events(event.conn_id)
+	
+	def _on_button_up_or_down(self, event):
+		_FlicClientBase._on_button_up_or_down(self, event)
+		self._put_button_event("button_up_or_down", event)
+	
+	def _on_button_click_or_hold(self, event):
+		_FlicClientBase._on_button_click_or_hold(self, event)
+		self._put_button_event("button_click_or_hold", event)
+	
+	def _on_button_single_or_double_click(self, event):
+		_FlicClientBase._on_button_single_or_double_click(self, event)
+		self._put_button_event("button_single_or_double_click", event)
+	
+	def _on_button_single_or_double_click_or_hold(self, event):
+		_FlicClientBase._on_button_single_or_double_click_or_hold(self, event)
+		self._put_button_event("button_single_or_double_click_or_hold", event)
+	
+	def _on_get_info_response(self, event):
+		future = self._get_info_response_queue.popleft()
+		if not future.done():
+			future.set_result(event)
+	
+	def _on_get_button_info_response(self, event):
+		future = self._get_button_info_queue.popleft()
+		if not future.done():
+			future.set_result((event.bd_addr, event.uuid, event.color))
@@ -7,6 +7,10 @@ import sys
 import os
 import signal
 import json
+import functools
+import threading
+import time
+import util
 
 for handler in logging.root.handlers[:]:
     logging.root.removeHandler(handler)
@@ -18,38 +22,53 @@ logging.basicConfig(
 )
 logging.getLogger('urllib3').setLevel(logging.INFO)
 
-BLACK_BUTTON_ADDRESS = '80:e4:da:70:32:3b'
-TURQUOISE_BUTTON_ADDRESS = '80:e4:da:73:70:72'
+BLACK_BUTTON_ADDRESS = fliclib.intern_bd_addr('80:e4:da:70:32:3b')
+TURQUOISE_BUTTON_ADDRESS = fliclib.intern_bd_addr('80:e4:da:73:70:72')
+FLIC_BUTTON_NAMES = {
+    BLACK_BUTTON_ADDRESS: 'Black',
+    TURQUOISE_BUTTON_ADDRESS: 'Turqouise',
+}
 
 logger = None
-flicClient = None
+flicClientPool = None
 flicButtonConnectionChannels = None
-castDevice = None
-deviceNamesToSetVolumeFor = None
-deviceToCastTo = None
-hasDevicePlayerStatusListener = False
+castDevices = []
+volumePresets = None
+devicesToCastTo = None
+# play/stop runs off the Flic event thread, with one worker per set of target
+# devices
+playOrStopQueues = util.KeyedWorkQueues(maxQueueSize=2, name='playOrStop')
+# caster setup and Flic server connections run concurrently on startup
+startupTasks = util.InitTasks(name='Startup')
+flicInfoReceived = threading.Event()
+
+FLIC_GET_INFO_TIMEOUT = 10.0  # in seconds
+CLICK_LATENCY_BUDGET = 10.0  # in seconds
 
 
 def getFlicButtonName(buttonId):
-    if buttonId == BLACK_BUTTON_ADDRESS:
-        return 'Black'
-    if buttonId == TURQUOISE_BUTTON_ADDRESS:
-        return 'Turqouise'
-    else:
-        return 'UNKNOWN'
+    return FLIC_BUTTON_NAMES.get(buttonId, 'UNKNOWN')
 
 
 def stopAndQuitCasting(device, forceQuit=False):
-    global castDevice, hasDevicePlayerStatusListener
+    global castDevices
 
-    castDevice = None
-    hasDevicePlayerStatusListener = False
+    castDevices = [i for i in castDevices if i is not device]
 
     if not forceQuit:
-        if caster.isPlaying(device) or caster.isPaused(device):
-            caster.stop(device)
+        return caster.stopAndQuit(device)
+
+    return None
+
+
+def stopAndQuitCastingOnAll(forceQuit=False):
+    '''
+    Returns: list Teardown threads of the devices cast to
+    '''
 
-        caster.quit(device, disconnectFromDevice=True)
+    return [
+        stopAndQuitCasting(i, forceQuit=forceQuit) for i in list(castDevices)
+    ]
 
 
 def playOrStop(data):
@@ -57,41 +76,56 @@ def playOrStop(data):
     :param data: dict
     '''
 
-    global castDevice, hasDevicePlayerStatusListener
+    global castDevices
 
-    if castDevice is not None and caster.isPlaying(castDevice):
+    # the state shadow may not know yet about Spotify playback started
+    # elsewhere (e.g. from the Spotify app)
+    if any(caster.isPlaying(
+            i,
+            maxSpotifyStateAge=caster.SPOTIFY_PLAYBACK_STATE_CACHE_TTL)
+            for i in castDevices):
         logger.info('Currently playing - stopping')
-        stopAndQuitCasting(castDevice)
+        stopAndQuitCastingOnAll()
     else:
-        try:
-            castDevice = caster.play(data, caster.getDevice(deviceToCastTo))
-        except (caster.DeviceNotFoundError,
-                caster.SpotifyPlaybackError) as e:
-            logger.error('Failed to start playback: {}'.format(e))
-            exit(1)
-        else:
-            if not castDevice:
-                return
+        starts = caster.playOnDevices(data, devicesToCastTo)
 
-        def onDevicePlayerStatus(device, status):
-            global castDevice
+        castDevices = [i.device for i in starts if i.hasStarted]
+
+        if not castDevices:
+            logger.error('Failed to start playback: {}'.format(
+                '; '.join(str(i.error) for i in starts if not i.skipped)
+            ))
+
+            if any(isinstance(i.error, (caster.DeviceNotFoundError,
+                                        caster.SpotifyPlaybackError))
+                   for i in starts):
+                exit(1)
+
+            return
 
-            if not castDevice:
+        def onDevicePlayerStatus(device, status):
+            if device not in castDevices:
                 logger.debug(
-                    'Got device media player state "{}" while `castDevice` '
-                    'was `None`'.format(status.player_state)
+                    'Got media player state "{}" of "{}" while not casting '
+                    'to it'.format(status.player_state, device.name)
                 )
                 return
 
             logger.info(
-                'Got device media player state "{}"'.format(
-                    status.player_state
+                'Got media player state "{}" of "{}"'.format(
+                    status.player_state,
+                    device.name
                 )
             )
 
-            if not caster.isPlaying(device) and status.player_state in (
-                    caster.MEDIA_PLAYER_STATE_IDLE,
-                    caster.MEDIA_PLAYER_STATE_UNKNOWN):
+            isIdle = status.player_state in (
+                caster.MEDIA_PLAYER_STATE_IDLE,
+                caster.MEDIA_PLAYER_STATE_UNKNOWN
+            )
+
+            # Spotify playback ending (e.g. at the end of a playlist) doesn't
+            # show in the state shadow - ask Spotify (or its cached answer)
+            if isIdle and not caster.isPlaying(device, maxSpotifyStateAge=0):
                 logger.debug('Player state is valid for exit')
                 stopAndQuitCasting(device)
                 return
@@ -103,43 +137,26 @@ def playOrStop(data):
                 stopAndQuitCasting(device)
                 return
 
-        if not hasDevicePlayerStatusListener:
-            caster.addDevicePlayerStatusListener(
-                castDevice,
-                onDevicePlayerStatus
-            )
+        for i in castDevices:
+            caster.addDevicePlayerStatusListener(i, onDevicePlayerStatus)
+
+        if volumePresets:
+            caster.applyVolumePresets(volumePresets)
+
+
+def handleClick(data):
+    '''
+    :param data: dict
+    '''
+
+    # clicks made while starting up get handled once ready
+    if not startupTasks.wait():
+        return
 
-            hasDevicePlayerStatusListener = True
-
-        ########################
-        # setting device volumes
-        if deviceNamesToSetVolumeFor is not None:
-            devicesToSetVolumeFor = None
-
-            try:
-                devicesToSetVolumeFor = [
-                    {
-                        'device': caster.getDevice(a[0]),
-                        'volume': float(a[1])
-                    } for a in [
-                        [
-                            n.strip() for n in i.strip().split('=')
-                        ] for i in deviceNamesToSetVolumeFor.split(',')
-                    ]
-                ]
-            except caster.DeviceNotFoundError:
-                pass
-            else:
-                if devicesToSetVolumeFor is not None:
-                    [caster.setVolume(
-                        i['device'],
-                        i['volume']
-                    ) for i in devicesToSetVolumeFor]
-
-                    [i['device'].disconnect(
-                        blocking=False
-                    ) for i in devicesToSetVolumeFor]
-        ########################
+    # don't let a slow Spotify Web API hold up the click (and the ones
+    # queued after it) for long
+    with caster.latencyBudget(CLICK_LATENCY_BUDGET):
+        playOrStop(data)
 
 
 def getFlicButtonCasterMediaData(buttonAddress):
@@ -187,7 +204,25 @@ def onFlicButtonClickOrHold(channel, clickType, wasQueued, timeDiff):
     buttonCasterMediaData = getFlicButtonCasterMediaData(channel.bd_addr)
 
     if buttonCasterMediaData:
-        playOrStop({'media': buttonCasterMediaData})
+        result = playOrStopQueues.submit(
+            tuple(devicesToCastTo),
+            functools.partial(handleClick, {'media': buttonCasterMediaData}),
+            toggleId=channel.bd_addr
+        )
+
+        if result == util.JOB_CANCELLED:
+            logger.info(
+                '{} button clicked again before previous click was handled '
+                '- cancelled both'.format(getFlicButtonName(channel.bd_addr))
+            )
+        elif result == util.JOB_DROPPED:
+            logger.warning(
+                'Too many clicks waiting for "{}" - dropped click of {} '
+                'button'.format(
+                    '", "'.join(devicesToCastTo),
+                    getFlicButtonName(channel.bd_addr)
+                )
+            )
     else:
         logger.info(
             'Not playing nor stopping - got no caster'
@@ -225,7 +260,9 @@ def onFlicButtonCreateConnectionChannelResponse(channel,
         logger.debug('Button "{}" got create connection channel response'
                      .format(channel.bd_addr))
 
-        flicButtonConnectionChannels.append(channel)
+        # channels get created anew when the Flic client reconnects
+        if channel not in flicButtonConnectionChannels:
+            flicButtonConnectionChannels.append(channel)
 
 
 def onFlicButtonConnectionChannelRemoved(channel, removedReason=None):
@@ -242,7 +279,7 @@ def onFlicButtonConnectionChannelRemoved(channel, removedReason=None):
     )
 
 
-def onFlicNewVerifiedButton(bdAddr):
+def createFlicButtonConnectionChannel(bdAddr):
     cc = fliclib.ButtonConnectionChannel(bdAddr)
 
     cc.on_button_click_or_hold = onFlicButtonClickOrHold
@@ -251,14 +288,91 @@ def onFlicNewVerifiedButton(bdAddr):
         onFlicButtonCreateConnectionChannelResponse
     cc.on_removed = onFlicButtonConnectionChannelRemoved
 
-    flicClient.add_connection_channel(cc)
+    return cc
+
+
+def onFlicNewVerifiedButton(flicClient, bdAddr):
+    flicClient.add_connection_channel(
+        createFlicButtonConnectionChannel(bdAddr)
+    )
+
+
+def setupFlicClients(flicServerHosts):
+    '''
+    Connects to the Flic servers and waits for them to report their
+    verified buttons. The pool's event loop has to be running meanwhile.
+
+    :param flicServerHosts: list `host[:port]` strings
+    '''
+
+    for flicServerHost in flicServerHosts:
+        host, _, port = flicServerHost.partition(':')
+        flicClient = flicClientPool.connect(
+            host,
+            int(port or 5551),
+            reconnect=True
+        )
+        flicClient.on_new_verified_button = functools.partial(
+            onFlicNewVerifiedButton,
+            flicClient
+        )
+        flicClient.on_bluetooth_controller_state_change = \
+            onFlicBluetoothControllerStateChange
+        flicClient.on_connection_lost = functools.partial(
+            onFlicConnectionLost,
+            flicServerHost
+        )
+        flicClient.on_reconnected = functools.partial(
+            onFlicReconnected,
+            flicServerHost
+        )
+
+    flicClientPool.get_info(onFlicGetInfo)
 
+    if not flicInfoReceived.wait(FLIC_GET_INFO_TIMEOUT):
+        raise Exception('Timed out waiting for Flic server info')
 
-def onFlicGetInfo(items):
-    logger.debug('onFlicGetInfo - items: {}'.format(items))
 
-    for bdAddr in items['bd_addr_of_verified_buttons']:
-        onFlicNewVerifiedButton(bdAddr)
+def prefetchFlicButtonMedia():
+    try:
+        casterMediaData = json.loads(os.environ.get('CASTER_MEDIA_DATA', '{}'))
+    except json.decoder.JSONDecodeError:
+        # gets reported on click
+        return
+
+    caster.prefetchMedia([
+        i['uri'] for i in casterMediaData.values() if i.get('uri')
+    ])
+
+
+def waitForStartup():
+    if not startupTasks.wait():
+        logger.error('Failed to start up: {}'.format(startupTasks.error))
+        exit(1, forceQuitCaster=True)
+        return
+
+    logger.info('Ready - waiting for button clicks...\n---')
+
+
+def onFlicGetInfo(infos):
+    for flicClient, items in infos:
+        logger.debug('onFlicGetInfo - items: {}'.format(items))
+
+        # send all channel creation commands to flicd in a single write
+        flicClient.add_connection_channels([
+            createFlicButtonConnectionChannel(bdAddr)
+            for bdAddr in items['bd_addr_of_verified_buttons']
+        ])
+
+    logger.info(
+        'Got {} verified Flic button(s) across {} Flic server(s)'.format(
+            sum(len(items['bd_addr_of_verified_buttons'])
+                for _, items in infos),
+            len(infos)
+        )
+    )
+
+    flicInfoReceived.set()
 
 
 def onFlicBluetoothControllerStateChange(state):
@@ -266,12 +380,28 @@ def onFlicBluetoothControllerStateChange(state):
         'onFlicBluetoothControllerStateChange - state: {}'.format(state)
     )
 
-    if state == fliclib.ConnectionStatus.Disconnected:
-        logger.info(
-            'Flic Bluetooth controller got disconnected state - exiting...'
+    if state == fliclib.BluetoothControllerState.Detached:
+        logger.warning(
+            'Flic Bluetooth controller got detached - buttons will '
+            'reconnect once it is attached again'
+        )
+
+
+def onFlicConnectionLost(flicServerHost):
+    logger.warning(
+        'Lost connection to Flic server "{}" - reconnecting...'.format(
+            flicServerHost
         )
+    )
+
 
-        exit(1)
+def onFlicReconnected(flicServerHost, recoveryTime):
+    logger.info(
+        'Reconnected to Flic server "{}" after {:.3f} seconds'.format(
+            flicServerHost,
+            recoveryTime
+        )
+    )
 
 
 def onCasterError(error=None):
@@ -280,16 +410,16 @@ def onCasterError(error=None):
 
 
 def exit(exitCode=0, forceQuitCaster=False):
-    global castDevice
-
     logger.info('Stopping subprocesses...')
 
-    if flicClient is not None:
+    if flicClientPool is not None:
         logger.debug(
             'Waiting for all Flic button connection channels to get removed...'
         )
         for i in flicButtonConnectionChannels:
-            flicClient.remove_connection_channel(i)
+            # only the client the channel was added to will remove it
+            for flicClient in flicClientPool.clients:
+                flicClient.remove_connection_channel(i)
 
             # should not have to call this manually
             # - this should get called when `channel.on_removed` gets
@@ -299,20 +429,41 @@ def exit(exitCode=0, forceQuitCaster=False):
         while len(flicButtonConnectionChannels) != 0:
             pass
 
-        flicClient.close()
+        flicClientPool.close()
 
     caster.cancelDeviceHostScanner()
 
     if not forceQuitCaster:
-        stopAndQuitCasting(castDevice, forceQuit=forceQuitCaster)
+        teardownDeadline = time.monotonic() + caster.STOP_TEARDOWN_DEADLINE
+
+        # the devices get torn down concurrently - wait for all of them
+        for teardown in stopAndQuitCastingOnAll(forceQuit=forceQuitCaster):
+            if teardown is not None:
+                teardown.join(max(teardownDeadline - time.monotonic(), 0))
     else:
         logger.info(
             'Exit was called with caster force quit requested - '
             'not calling caster’s stop+quit'
         )
 
+    caster.closeDevicePool()
+
+    logger.info('Spotify state cache stats: {}'.format(
+        caster.getSpotifyStateCacheStats()))
+    logger.info('Spotify OAuth token metrics: {}'.format(
+        caster.getSpotifyOAuthTokenMetrics()))
+    logger.info('Media status pipeline stats: {}'.format(
+        caster.getMediaStatusPipelineStats()))
+    logger.info('Last stop latencies: {}'.format(
+        caster.getLastStopLatencies()))
+
     logger.info('Exiting with code {}'.format(exitCode))
 
+    if threading.current_thread() is not threading.main_thread():
+        # `sys.exit` would only end the calling thread
+        logging.shutdown()
+        os._exit(exitCode)
+
     sys.exit(exitCode)
 
 
@@ -329,8 +480,16 @@ def onSIGTERM(*args):
 if __name__ == '__main__':
     logger = logging.getLogger(__name__)
 
-    deviceNamesToSetVolumeFor = os.environ.get('DEVICES_TO_SET_VOLUME_FOR')
-    deviceToCastTo = os.environ.get('DEVICE_TO_CAST_TO')
+    # several devices (comma separated) play in sync
+    devicesToCastTo = [
+        i.strip()
+        for i in os.environ.get('DEVICE_TO_CAST_TO', '').split(',')
+        if i.strip()
+    ]
+    flicServerHosts = [
+        i.strip()
+        for i in os.environ.get('FLICD_HOSTS', 'localhost').split(',')
+    ]
 
     logLevel = os.environ.get('LOG_LEVEL')
     if logLevel == 'CRITICAL':
@@ -344,10 +503,17 @@ if __name__ == '__main__':
     elif logLevel == 'DEBUG':
         logger.setLevel(logging.DEBUG)
 
-    if not deviceToCastTo:
+    if not devicesToCastTo:
         logger.error('No target device specified in env vars')
         sys.exit(1)
 
+    try:
+        volumePresets = caster.parseVolumePresets(
+            os.environ.get('DEVICES_TO_SET_VOLUME_FOR', ''))
+    except ValueError as e:
+        logger.error('Invalid DEVICES_TO_SET_VOLUME_FOR: {}'.format(e))
+        sys.exit(1)
+
     signal.signal(signal.SIGINT, onSIGINT)
     signal.signal(signal.SIGTERM, onSIGTERM)
 
@@ -366,26 +532,30 @@ if __name__ == '__main__':
     # while True:
     #     pass
 
-    try:
-        logger.info('Setting up Flic client...')
+    flicButtonConnectionChannels = []
+    flicClientPool = fliclib.FlicClientPool()
 
-        flicButtonConnectionChannels = []
+    logger.info('Setting up caster and Flic client(s)...')
 
-        flicClient = fliclib.FlicClient('localhost')
-        flicClient.get_info(onFlicGetInfo)
-        flicClient.on_new_verified_button = onFlicNewVerifiedButton
-        flicClient.on_bluetooth_controller_state_change = \
-            onFlicBluetoothControllerStateChange
-    except Exception as e:
-        logger.error('Failed to start Flic client: {}'.format(e))
-        exit(1, forceQuitCaster=True)
-    else:
-        caster.setup(
-            logLevel=logger.level,
-            errorHandler=onCasterError
-        )
+    caster.setup(
+        logLevel=logger.level,
+        errorHandler=onCasterError,
+        initTasks=startupTasks
+    )
+    startupTasks.add(
+        'Flic clients',
+        functools.partial(setupFlicClients, flicServerHosts)
+    )
+    # a click resolves its media itself if it comes before this is done
+    startupTasks.add('media prefetch', prefetchFlicButtonMedia, required=False)
+    startupTasks.start()
 
-    logger.info('Ready - waiting for button clicks...\n---')
+    startupWaiter = threading.Thread(
+        target=waitForStartup,
+        name='startup-waiter'
+    )
+    startupWaiter.daemon = True
+    startupWaiter.start()
 
     # note that this method is blocking!
-    flicClient.handle_events()
+    flicClientPool.handle_events()
@@ -1,6 +1,17 @@
 import socket
 import psutil
 import os
+import threading
+import logging
+from collections import deque
+from time import time, monotonic
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = 'queued'
+JOB_CANCELLED = 'cancelled'
+JOB_DROPPED = 'dropped'
+JOB_MERGED = 'merged'
 
 
 def formatTimeDelta(delta):
@@ -14,6 +25,37 @@ def formatTimeDelta(delta):
     )
 
 
+def writeFileAtomically(path, content, mode=0o644):
+    '''
+    Writes to a temp file next to `path` first and then moves it in place,
+    so that readers (and a crash midway) never see a partly written file
+
+    :param path: str
+    :param content: str
+    :param mode: int Permissions of the written file
+    '''
+
+    tempPath = '{}.{}.{}.tmp'.format(
+        path,
+        os.getpid(),
+        threading.get_ident()
+    )
+
+    fd = os.open(tempPath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+
+        os.replace(tempPath, path)
+    except BaseException:
+        try:
+            os.unlink(tempPath)
+        except OSError:
+            pass
+        raise
+
+
 def getLocalIpAddress():
     s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     s.connect(('8.8.8.8', 80))
@@ -51,3 +93,483 @@ def getProcessesByName(processNames, args=None):
             pass
 
     return processes
+
+
+class KeyedWorkQueues:
+    '''
+    Runs jobs on one worker thread per key (e.g. per target device), so
+    jobs for the same key run in order while jobs for different keys run in
+    parallel.
+    '''
+
+    def __init__(self, maxQueueSize=4, name='worker'):
+        self.maxQueueSize = maxQueueSize
+        self.name = name
+        self._condition = threading.Condition()
+        self._queues = {}
+
+    def submit(self, key, job, toggleId=None):
+        '''
+        :param key: Jobs with the same key run in order on the same thread
+        :param job: Callable taking no arguments
+        :param toggleId: Jobs with the same toggle id are assumed to undo each
+            other (e.g. play/stop clicks of the same button) - submitting one
+            while another is still waiting in the queue cancels both
+        Returns: str `JOB_QUEUED`, `JOB_CANCELLED` or `JOB_DROPPED` (queue
+            was full)
+        '''
+
+        with self._condition:
+            queue = self._queues.get(key)
+
+            if queue is None:
+                queue = self._queues[key] = deque()
+
+                worker = threading.Thread(
+                    target=self._work,
+                    args=(queue,),
+                    name='{}-{}'.format(self.name, key)
+                )
+                worker.daemon = True
+                worker.start()
+
+            if toggleId is not None:
+                waitingJob = next(
+                    (i for i in queue if i[0] == toggleId), None
+                )
+
+                if waitingJob is not None:
+                    queue.remove(waitingJob)
+                    return JOB_CANCELLED
+
+            if len(queue) >= self.maxQueueSize:
+                return JOB_DROPPED
+
+            queue.append((toggleId, job))
+            self._condition.notify_all()
+
+            return JOB_QUEUED
+
+    def _work(self, queue):
+        while True:
+            with self._condition:
+                while not queue:
+                    self._condition.wait()
+
+                _, job = queue.popleft()
+
+            try:
+                job()
+            except Exception:
+                logger.exception('Error: Job failed in {}'.format(
+                    threading.current_thread().name
+                ))
+
+
+class InitTasks:
+    '''
+    Runs init tasks (e.g. authenticating, discovering devices, connecting to
+    servers) concurrently, each on its own thread, and lets callers wait for
+    the ones required to be ready.
+    '''
+
+    def __init__(self, name='Init'):
+        self.name = name
+        self._condition = threading.Condition()
+        self._tasks = []
+        self._pendingRequiredTaskNames = set()
+        self._error = None
+        self._startTime = None
+
+    @property
+    def isReady(self):
+        with self._condition:
+            return self._startTime is not None and \
+                not self._pendingRequiredTaskNames and self._error is None
+
+    @property
+    def error(self):
+        '''
+        The exception raised by the first required task to fail, if any
+        '''
+
+        with self._condition:
+            return self._error
+
+    def add(self, name, task, required=True):
+        '''
+        :param name: str Name to log the task's timing with
+        :param task: Callable taking no arguments
+        :param required: bool Whether `wait` should wait for the task
+        '''
+
+        with self._condition:
+            if self._startTime is not None:
+                raise RuntimeError('{} tasks already started'.format(
+                    self.name))
+
+            self._tasks.append((name, task))
+
+            if required:
+                self._pendingRequiredTaskNames.add(name)
+
+    def start(self):
+        with self._condition:
+            self._startTime = time()
+            tasks = list(self._tasks)
+
+        for name, task in tasks:
+            worker = threading.Thread(
+                target=self._run,
+                args=(name, task),
+                name='{}-{}'.format(self.name, name)
+            )
+            worker.daemon = True
+            worker.start()
+
+    def wait(self, timeout=None):
+        '''
+        Waits until all required tasks are done
+
+        :param timeout: float|None Max seconds to wait
+        Returns: bool True if all required tasks succeeded, False if one of
+            them failed (see `error`) or the timeout was reached
+        '''
+
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._error is not None or
+                not self._pendingRequiredTaskNames,
+                timeout
+            )
+
+            return not self._pendingRequiredTaskNames and \
+                self._error is None
+
+    def _run(self, name, task):
+        startTime = time()
+
+        try:
+            task()
+        except Exception as e:
+            logger.exception(
+                'Error: {} task "{}" failed after {:.3f} seconds'.format(
+                    self.name,
+                    name,
+                    time() - startTime
+                )
+            )
+
+            with self._condition:
+                if name in self._pendingRequiredTaskNames and \
+                        self._error is None:
+                    self._error = e
+
+                self._condition.notify_all()
+            return
+
+        logger.info('{} task "{}" done after {:.3f} seconds'.format(
+            self.name,
+            name,
+            time() - startTime
+        ))
+
+        with self._condition:
+            self._pendingRequiredTaskNames.discard(name)
+
+            if not self._pendingRequiredTaskNames and self._error is None:
+                logger.info(
+                    'All required {} tasks done after {:.3f} seconds'.format(
+                        self.name.lower(),
+                        time() - self._startTime
+                    )
+                )
+
+            self._condition.notify_all()
+
+
+class _PendingFetch:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TtlCache:
+    '''
+    Caches values for a short while, and lets concurrent callers asking for
+    the same missing key share a single fetch rather than each doing their
+    own
+    '''
+
+    def __init__(self, name='cache'):
+        self.name = name
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._pendingFetches = {}
+        self._generations = {}
+        self._hits = 0
+        self._misses = 0
+        self._sharedFetches = 0
+
+    @property
+    def stats(self):
+        '''
+        Returns: dict Counts of `hits`, `misses` (fetches made) and
+            `sharedFetches` (misses that waited for another caller's fetch)
+        '''
+
+        with self._lock:
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'sharedFetches': self._sharedFetches,
+            }
+
+    def get(self, key, fetch, ttl):
+        '''
+        :param key: Key to cache the value by
+        :param fetch: Callable taking no arguments, returning the value -
+            exceptions raised by it are raised to all callers sharing the
+            fetch, and nothing gets cached
+        :param ttl: float Seconds to keep the value for
+        '''
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None and entry[1] > monotonic():
+                self._hits += 1
+                return entry[0]
+
+            pendingFetch = self._pendingFetches.get(key)
+            isSharedFetch = pendingFetch is not None
+
+            if isSharedFetch:
+                self._sharedFetches += 1
+            else:
+                pendingFetch = self._pendingFetches[key] = _PendingFetch()
+                generation = self._generations.get(key, 0)
+                self._misses += 1
+
+        if isSharedFetch:
+            pendingFetch.done.wait()
+
+            if pendingFetch.error is not None:
+                raise pendingFetch.error
+
+            return pendingFetch.value
+
+        try:
+            pendingFetch.value = fetch()
+        except Exception as e:
+            pendingFetch.error = e
+            raise
+        else:
+            with self._lock:
+                # don't cache values fetched before an invalidation
+                if self._generations.get(key, 0) == generation:
+                    self._entries[key] = (
+                        pendingFetch.value,
+                        monotonic() + ttl
+                    )
+
+            return pendingFetch.value
+        finally:
+            with self._lock:
+                if self._pendingFetches.get(key) is pendingFetch:
+                    del self._pendingFetches[key]
+
+            pendingFetch.done.set()
+
+    def invalidate(self, *keys):
+        '''
+        Drops the given keys - or all of them, if none given - so that the
+        next `get` fetches anew
+
+        :param keys: Keys to drop
+        '''
+
+        with self._lock:
+            if not keys:
+                keys = set(self._entries) | set(self._pendingFetches)
+
+            for key in keys:
+                self._entries.pop(key, None)
+                self._pendingFetches.pop(key, None)
+                self._generations[key] = self._generations.get(key, 0) + 1
+
+
+class CircuitBreaker:
+    '''
+    Fails calls to a degraded service fast, rather than having every caller
+    wait for it to time out. Opens after `failureThreshold` failures in a
+    row and, once `resetTimeout` seconds have passed, lets a single trial
+    call through - the breaker closes again if that call succeeds.
+    '''
+
+    def __init__(self, name='service', failureThreshold=3, resetTimeout=30.0):
+        self.name = name
+        self.failureThreshold = failureThreshold
+        self.resetTimeout = resetTimeout
+        self._lock = threading.Lock()
+        self._failureCount = 0
+        self._openedAt = None
+        self._isTrialCallInProgress = False
+
+    @property
+    def isOpen(self):
+        with self._lock:
+            return self._openedAt is not None
+
+    def allowRequest(self):
+        '''
+        Returns: bool Whether a call may be made - callers must report its
+            outcome with `recordSuccess` or `recordFailure`
+        '''
+
+        with self._lock:
+            if self._openedAt is None:
+                return True
+
+            if self._isTrialCallInProgress or \
+                    monotonic() - self._openedAt < self.resetTimeout:
+                return False
+
+            self._isTrialCallInProgress = True
+            return True
+
+    def recordSuccess(self):
+        with self._lock:
+            wasOpen = self._openedAt is not None
+            self._failureCount = 0
+            self._openedAt = None
+            self._isTrialCallInProgress = False
+
+        if wasOpen:
+            logger.info('{} circuit breaker closed'.format(self.name))
+
+    def recordFailure(self):
+        with self._lock:
+            self._failureCount += 1
+            wasTrialCall = self._isTrialCallInProgress
+            self._isTrialCallInProgress = False
+
+            if not wasTrialCall and (
+                    self._openedAt is not None or
+                    self._failureCount < self.failureThreshold):
+                return
+
+            self._openedAt = monotonic()
+            failureCount = self._failureCount
+
+        logger.warning(
+            '{} circuit breaker {} after {} failure(s) - failing calls fast '
+            'for {} seconds'.format(
+                self.name,
+                'reopened' if wasTrialCall else 'opened',
+                failureCount,
+                self.resetTimeout
+            )
+        )
+
+
+class CoalescingWorker:
+    '''
+    Hands items to `handler` on a worker thread of its own, so that whoever
+    submits them never waits for the handler. Items submitted for the same
+    key within `window` seconds get merged - only the latest one is
+    handled.
+    '''
+
+    def __init__(self, handler, window=0.1, maxSize=32, name='coalescer'):
+        '''
+        :param handler: Callable taking the key and the item
+        :param window: float Seconds to wait for more items of the same key
+        :param maxSize: int Max number of keys with items waiting
+        '''
+
+        self.handler = handler
+        self.window = window
+        self.maxSize = maxSize
+        self.name = name
+        self._condition = threading.Condition()
+        # in order of submission, which - with windows of equal length -
+        # is the order they're due in
+        self._pendingItems = {}
+        self._worker = None
+        self._stats = {
+            'submitted': 0,
+            'merged': 0,
+            'dropped': 0,
+            'handled': 0,
+        }
+
+    @property
+    def stats(self):
+        '''
+        Returns: dict Counts of items `submitted`, `merged` into a later
+            one, `dropped` due to a full queue and `handled`
+        '''
+
+        with self._condition:
+            return dict(self._stats)
+
+    def submit(self, key, item):
+        '''
+        Returns: str `JOB_QUEUED`, `JOB_MERGED` (replaced a waiting item of
+            the same key) or `JOB_DROPPED` (too many keys waiting)
+        '''
+
+        with self._condition:
+            self._stats['submitted'] += 1
+
+            if key in self._pendingItems:
+                self._pendingItems[key][0] = item
+                self._stats['merged'] += 1
+                return JOB_MERGED
+
+            if len(self._pendingItems) >= self.maxSize:
+                self._stats['dropped'] += 1
+                return JOB_DROPPED
+
+            self._pendingItems[key] = [item, monotonic() + self.window]
+
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._work,
+                    name=self.name
+                )
+                self._worker.daemon = True
+                self._worker.start()
+
+            self._condition.notify()
+
+            return JOB_QUEUED
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while True:
+                    if not self._pendingItems:
+                        self._condition.wait()
+                        continue
+
+                    key, (item, dueAt) = next(iter(self._pendingItems.items()))
+                    delay = dueAt - monotonic()
+
+                    if delay <= 0:
+                        del self._pendingItems[key]
+                        break
+
+                    self._condition.wait(delay)
+
+            try:
+                self.handler(key, item)
+            except Exception:
+                logger.exception('Error: Handling item failed in {}'.format(
+                    self.name
+                ))
+
+            with self._condition:
+                self._stats['handled'] += 1